@@ -16,5 +16,15 @@ END
 # Collect static files
 python manage.py collectstatic --noinput
 
+# Prometheus metrics of all the processes (uvicorn workers, jobs worker) are gathered in PROMETHEUS_MULTIPROC_DIR,
+# emptied on every start so the values of the previous run aren't added to the new ones
+if [ -n "$PROMETHEUS_MULTIPROC_DIR" ]; then
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+fi
+
+# Start the background jobs worker (image renditions, resizing, contact emails)
+python manage.py run_jobs &
+
 # Start Uvicorn server
 exec uvicorn murtidjango.asgi:application --host 0.0.0.0 --port 80
@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.models import Group
 
 # Register your models here.
-from .models import Album, Image
+from .models import Album, Image, ImageBlob, Job
 
 
 @admin.register(Album)
@@ -23,6 +23,24 @@ class ImageAdmin(admin.ModelAdmin):
     list_per_page = 20
 
 
+@admin.register(ImageBlob)
+class ImageBlobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'size', 'ref_count', 'created_at')
+    search_fields = ('sha256', 'name')
+    ordering = ('-created_at',)
+    readonly_fields = ('sha256', 'name', 'size', 'ref_count', 'created_at')
+    list_per_page = 50
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'created_at', 'updated_at')
+    list_filter = ('status', 'name')
+    ordering = ('-created_at',)
+    readonly_fields = ('created_at', 'updated_at')
+    list_per_page = 50
+
+
 admin.site.unregister(Group)
 
 
@@ -9,3 +9,4 @@ class FotodbConfig(AppConfig):
 
     def ready(self):
         import fotodb.signals
+        import fotodb.tasks
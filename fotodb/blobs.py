@@ -0,0 +1,131 @@
+import hashlib
+import logging
+
+from PIL import Image as PILImage, UnidentifiedImageError
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from django.db.models import F, ProtectedError
+from django.db.models.functions import Greatest
+
+# Custom:
+from fotodb.models import Image, ImageBlob, shard_name
+from fotodb.performance import pillow_timer
+from fotodb.renditions import delete_renditions
+
+logger = logging.getLogger(__name__)
+
+BLOBS_DIR = 'images'
+
+# extension of a stored file, by the format Pillow finds in its content
+FORMAT_EXTENSIONS = {
+    'JPEG': '.jpg',
+    'PNG': '.png',
+    'GIF': '.gif',
+    'WEBP': '.webp',
+    'BMP': '.bmp',
+    'TIFF': '.tif',
+    'ICO': '.ico',
+}
+
+
+def file_digest(file):
+    """
+    SHA-256 (hex) and size of an uploaded/opened file, read in chunks. The file is rewound afterwards.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    return digest.hexdigest(), size
+
+
+def image_extension(file):
+    """
+    Extension of the image format of the file's content ('.jpg', '.png'...), '' for another format.
+    Never the extension of the uploaded file name: the media files are served with the type of their extension,
+    a file that Pillow reads as an image but named x.html would be served as a page of the site.
+    """
+    file.seek(0)
+    try:
+        with pillow_timer('format'), PILImage.open(file) as img:
+            extension = FORMAT_EXTENSIONS.get(img.format, '')
+    except (UnidentifiedImageError, OSError):
+        extension = ''
+    file.seek(0)
+    return extension
+
+
+def blob_name(digest, extension):
+    """
+    Storage name of the content with the given SHA-256 and image extension (see image_extension),
+    e.g. 'images/9f/86/9f86d08...0f00a08.jpg'.
+    """
+    return shard_name(digest, f'{digest}{extension}', BLOBS_DIR)
+
+
+def acquire_blob(file, digest=None, size=None):
+    """
+    Return the blob holding the content of file, with one more reference.
+    The file is written only if no blob has this content yet, otherwise the existing file is shared.
+    Call it in the transaction that saves the image, so a failed save also gives the reference back.
+    """
+    if digest is None:
+        digest, size = file_digest(file)
+
+    while True:
+        if ImageBlob.objects.filter(sha256=digest).update(ref_count=F('ref_count') + 1):
+            return ImageBlob.objects.get(sha256=digest)
+
+        name = default_storage.save(blob_name(digest, image_extension(file)), file)
+        try:
+            with transaction.atomic():
+                return ImageBlob.objects.create(sha256=digest, name=name, size=size, ref_count=1)
+        except IntegrityError:
+            # the same content was stored by a concurrent upload: drop this copy and share theirs
+            default_storage.delete(name)
+
+
+def store_image_file(image, file, digest=None, size=None):
+    """
+    Point the (unsaved or changed) Image at the blob with the content of file. Used by every upload path
+    (HomeView, MultipleImageView, the chunked upload and the resize job), the caller saves the image.
+    """
+    blob = acquire_blob(file, digest, size)
+    image.blob = blob
+    image.image = blob.name
+    return blob
+
+
+def _delete_files(name):
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    delete_renditions(name)
+
+
+def release_image_file(blob_id, name):
+    """
+    Give back the reference of an image to its file (the image was deleted or got another file).
+    The file and its renditions are deleted, once the transaction is committed, when no image uses them anymore.
+    Images uploaded before blobs existed (blob_id None) have their own file, unless another row points at it.
+    """
+    if blob_id is None:
+        if name and not Image.objects.filter(image=name).exists():
+            transaction.on_commit(lambda: _delete_files(name))
+        return
+
+    ImageBlob.objects.filter(pk=blob_id).update(ref_count=Greatest(F('ref_count') - 1, 0))
+    # the row is only deleted if no concurrent upload took a new reference in the meantime
+    blob = ImageBlob.objects.filter(pk=blob_id, ref_count=0).first()
+    if blob is None:
+        return
+    try:
+        deleted, _ = ImageBlob.objects.filter(pk=blob_id, ref_count=0).delete()
+    except ProtectedError:
+        # the counter drifted (fixed by reconcile_image_counters), an image still uses the file
+        logger.warning('Blob %s has a zero ref_count but is still referenced', blob.name)
+        return
+    if deleted:
+        transaction.on_commit(lambda: _delete_files(blob.name))
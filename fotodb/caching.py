@@ -0,0 +1,144 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.utils.crypto import salted_hmac
+
+# Custom:
+from murtidjango.replicas import read_from_primary
+from fotodb.metrics import count_cache_lookup
+from fotodb.roles import get_user_roles
+
+# Every cached page or fragment belongs to namespaces ('feed', 'image:<pk>', 'album:<pk>'), and the current version
+# of its namespaces is part of its key. The signals (see signals.py) change the version of the namespaces touched by
+# a change, so the stale entries are never read again and expire on their own.
+# The versions are kept in the 'versions' cache, the pages of the default cache can't push them out.
+VERSION_KEY = 'fotodb:cache-version:{}'
+
+
+def namespace_version(*namespaces):
+    """
+    Current version of the given namespaces, as a string to put in a cache key.
+    """
+    keys = [VERSION_KEY.format(namespace) for namespace in namespaces]
+    versions = caches['versions'].get_many(keys)
+    # a version is the time of the change. The replicas may not have received a change of the last
+    # REPLICA_PIN_SECONDS, the page would be cached (or get its ETag) under the new version with the old data:
+    # it is read from the primary
+    if versions and max(versions.values()) > time.time_ns() - settings.REPLICA_PIN_SECONDS * 10 ** 9:
+        read_from_primary()
+    missing = {key: time.time_ns() for key in keys if key not in versions}
+    if missing:
+        # a new (or evicted) namespace starts at the current time, it never matches an older version
+        caches['versions'].set_many(missing, None)
+        versions.update(missing)
+    return '.'.join(str(versions[key]) for key in keys)
+
+
+def invalidate(*namespaces):
+    """
+    Give the namespaces a new version once the transaction is committed, so a request running in the meantime
+    can't cache the data from before the change under the new version.
+    """
+    def bump():
+        caches['versions'].set_many({VERSION_KEY.format(namespace): time.time_ns() for namespace in namespaces},
+                                    None)
+
+    transaction.on_commit(bump)
+
+
+class CachedResponseMixin:
+    """
+    Serves the GET requests of anonymous users from the cache: the page is rendered once per url (scheme and host,
+    which the pages show in their links, filters, page or cursor included) and namespace version, the next requests
+    don't touch the database.
+    Logged-in users get pages with their own data and CSRF token, they are rendered as usual.
+    """
+    cache_timeout = None
+
+    def get_cache_namespaces(self):
+        raise NotImplementedError
+
+    def get_cache_key(self):
+        namespaces = self.get_cache_namespaces()
+        path = hashlib.md5(self.request.build_absolute_uri().encode()).hexdigest()
+        return f'fotodb:page:{type(self).__name__}:{namespace_version(*namespaces)}:{path}'
+
+    def get(self, request, *args, **kwargs):
+        if request.user.is_authenticated:
+            return super().get(request, *args, **kwargs)
+
+        key = self.get_cache_key()
+        cached = cache.get(key)
+        count_cache_lookup('page', cached is not None)
+        if cached is not None:
+            content, content_type = cached
+            return HttpResponse(content, content_type=content_type)
+
+        response = super().get(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        # a page with a CSRF token belongs to one visitor
+        if response.status_code == 200 and not request.META.get('CSRF_COOKIE_NEEDS_UPDATE'):
+            timeout = self.cache_timeout or settings.PAGE_CACHE_TIMEOUT
+            cache.set(key, (response.content, response['Content-Type']), timeout)
+        return response
+
+
+class ConditionalGetMixin:
+    """
+    Adds an ETag to the GET responses and answers 304 Not Modified, without rendering the page, when the browser
+    already has the current version. The ETag is derived from the versions of the page's namespaces (bumped by the
+    signals on every change of its images, likes or comments), the URL and who is looking: the user and their roles,
+    which change the buttons on the page, and the CSRF secret of its forms. It is signed, so it can't be guessed for
+    a page the user never received, and doesn't reveal the secret.
+    The browser revalidates on every visit (no-cache), a repeat visit costs a cache lookup and no query for
+    anonymous users, and the user's session and user rows otherwise.
+    The view defines get_cache_namespaces(), as for CachedResponseMixin, and optionally etag_period: the ETag then
+    also changes every etag_period seconds, for the pages showing data that doesn't invalidate them (the like and
+    comment counts of the feeds, signed links).
+    """
+    etag_salt = 'fotodb.caching.etag'
+
+    def get_etag_parts(self):
+        user = self.request.user
+        if user.is_authenticated:
+            # and the CSRF secret of the forms on the page (the logout button at least), rotated when the user logs
+            # in again. get_token() creates it on the first visit, as rendering the page would
+            get_token(self.request)
+            viewer = [user.pk, user.is_staff, user.is_superuser, *sorted(get_user_roles(user)),
+                      self.request.META['CSRF_COOKIE']]
+        else:
+            viewer = ['anonymous']
+        parts = [type(self).__name__, self.request.build_absolute_uri(), namespace_version(*self.get_cache_namespaces()),
+                 *viewer]
+        period = getattr(self, 'etag_period', None)
+        if period:
+            parts.append(int(time.time()) // period)
+        return parts
+
+    def get_etag(self):
+        value = ':'.join(str(part) for part in self.get_etag_parts())
+        return quote_etag(salted_hmac(self.etag_salt, value, algorithm='sha256').hexdigest()[:32])
+
+    def get(self, request, *args, **kwargs):
+        # the views also render the page after a failed POST, which isn't conditional
+        if request.method not in ('GET', 'HEAD'):
+            return super().get(request, *args, **kwargs)
+
+        etag = self.get_etag()
+        response = get_conditional_response(request, etag=etag)
+        if 'HTTP_IF_NONE_MATCH' in request.META:
+            count_cache_lookup('etag', response is not None)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+        if 200 <= response.status_code < 300 or response.status_code == 304:
+            response['ETag'] = etag
+            # revalidated on every visit, and only the browser keeps the pages of logged-in users
+            patch_cache_control(response, no_cache=True, private=request.user.is_authenticated)
+        return response
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+
+from PIL import Image as PILImage, UnidentifiedImageError
+from django.conf import settings
+from django.core.files import File
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+# Custom:
+from fotodb.blobs import store_image_file
+from fotodb.metrics import count_upload
+from fotodb.models import Image, UploadSession, UploadChunk
+from fotodb.performance import pillow_timer
+
+# the request body and the staged file are read in blocks of this size, never as a whole
+BLOCK_SIZE = 64 * 1024
+
+
+class ChunkedUploadError(Exception):
+    """
+    The chunk or the upload was rejected, the message is returned to the client.
+    """
+
+
+class StagedFile(File):
+    """
+    The assembled file in the staging area. FileSystemStorage moves a file that has a temporary_file_path()
+    (os.rename) instead of copying its content, like Django does for the large uploads it buffers on disk.
+    """
+
+    def __init__(self, file, name, path):
+        super().__init__(file, name)
+        self.path = path
+
+    def temporary_file_path(self):
+        return self.path
+
+
+def staging_dir():
+    # inside MEDIA_ROOT by default, so the final move stays on the same filesystem
+    return settings.CHUNKED_UPLOAD_STAGING_DIR or os.path.join(settings.MEDIA_ROOT, 'chunked_uploads')
+
+
+def staging_path(upload):
+    return os.path.join(staging_dir(), str(upload.pk))
+
+
+def start_upload(upload):
+    """
+    Save a new UploadSession and create its staging file, with the final size (sparse until the chunks arrive).
+    """
+    upload.chunk_size = settings.CHUNKED_UPLOAD_CHUNK_SIZE
+    upload.save()
+    os.makedirs(staging_dir(), exist_ok=True)
+    with open(staging_path(upload), 'wb') as f:
+        f.truncate(upload.size)
+    return upload
+
+
+def missing_chunks(upload):
+    received = set(upload.chunks.values_list('index', flat=True))
+    return [index for index in range(upload.total_chunks) if index not in received]
+
+
+def write_chunk(upload, index, stream, checksum=None):
+    """
+    Write chunk number index, read from stream (the request body), at its offset in the staging file.
+    Sending a chunk again overwrites it, so a client only resends what is reported missing.
+    checksum is the optional SHA-256 (hex) of the chunk, the chunk isn't recorded as received if it doesn't match.
+    The chunk is received in a temporary file and copied into the staging file once its size and checksum are
+    checked, so a bad resend doesn't overwrite a chunk already received.
+    """
+    if upload.status != UploadSession.UPLOADING:
+        raise ChunkedUploadError('the upload is already finalized')
+    if index >= upload.total_chunks:
+        raise ChunkedUploadError(f'chunk index out of range (the upload has {upload.total_chunks} chunks)')
+
+    expected = upload.chunk_length(index)
+    digest = hashlib.sha256()
+    written = 0
+    with tempfile.TemporaryFile(dir=staging_dir()) as received:
+        while True:
+            data = stream.read(BLOCK_SIZE)
+            if not data:
+                break
+            written += len(data)
+            if written > expected:
+                raise ChunkedUploadError(f'chunk {index} must be {expected} bytes')
+            digest.update(data)
+            received.write(data)
+
+        if written != expected:
+            raise ChunkedUploadError(f'chunk {index} must be {expected} bytes, received {written}')
+        if checksum and checksum.lower() != digest.hexdigest():
+            raise ChunkedUploadError(f'chunk {index} checksum mismatch')
+
+        received.seek(0)
+        with open(staging_path(upload), 'r+b') as f:
+            f.seek(index * upload.chunk_size)
+            shutil.copyfileobj(received, f, BLOCK_SIZE)
+
+    try:
+        UploadChunk.objects.get_or_create(upload=upload, index=index)
+    except IntegrityError:
+        # the same chunk was recorded by a concurrent request
+        pass
+
+
+def _file_checksum(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def finalize_upload(upload):
+    """
+    Check that all the chunks arrived and the checksum of the assembled file, then move the staging file into
+    the media storage (unless the same content is already stored) and create the Image. Returns the image (also when the upload was already finalized,
+    so the client can safely repeat the call).
+    """
+    if upload.status == UploadSession.COMPLETE:
+        return upload.image
+
+    missing = missing_chunks(upload)
+    if missing:
+        raise ChunkedUploadError(f'{len(missing)} chunks are missing')
+
+    # only one request finalizes the upload
+    claimed = UploadSession.objects.filter(pk=upload.pk, status=UploadSession.UPLOADING).update(
+        status=UploadSession.FINALIZING,
+    )
+    if not claimed:
+        raise ChunkedUploadError('the upload is already being finalized')
+
+    path = staging_path(upload)
+    try:
+        if _file_checksum(path) != upload.checksum:
+            # the corrupted chunk isn't known, every chunk has to be sent again
+            upload.chunks.all().delete()
+            raise ChunkedUploadError('checksum mismatch, the file has to be uploaded again')
+
+        try:
+            with pillow_timer('verify'), PILImage.open(path):
+                pass
+        except UnidentifiedImageError:
+            raise ChunkedUploadError('the file is not a supported image')
+
+        image = Image(
+            title=upload.title or os.path.splitext(upload.filename)[0],
+            user=upload.user,
+            album=upload.album,
+            is_private=upload.is_private,
+            category=upload.category,
+        )
+        with open(path, 'rb') as f, transaction.atomic():
+            # the checksum was just verified, it is the content address of the file (see fotodb/blobs.py)
+            store_image_file(image, StagedFile(f, upload.filename, path), digest=upload.checksum, size=upload.size)
+            image.update_file_metadata()
+            image.save()
+        # left over when the same content was already stored
+        if os.path.exists(path):
+            os.remove(path)
+    except BaseException:
+        UploadSession.objects.filter(pk=upload.pk).update(status=UploadSession.UPLOADING)
+        upload.status = UploadSession.UPLOADING
+        raise
+
+    upload.status = UploadSession.COMPLETE
+    upload.image = image
+    upload.save(update_fields=['status', 'image'])
+    upload.chunks.all().delete()
+    count_upload('chunked', image.file_size)
+    return image
+
+
+def discard_upload(upload):
+    """
+    Delete an upload and its staging file.
+    """
+    try:
+        os.remove(staging_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def expired_uploads():
+    """
+    The uploads started more than CHUNKED_UPLOAD_EXPIRY seconds ago: abandoned ones, and finished ones
+    that don't need to be answered anymore.
+    """
+    started_before = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOAD_EXPIRY)
+    return UploadSession.objects.filter(created_at__lt=started_before)
@@ -1,12 +1,16 @@
 # built-in
+import re
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm, AuthenticationForm
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
+from django.core.files import File
+from django.core.validators import validate_image_file_extension
 from multiupload.fields import MultiFileField
 
 # custom
-from .models import Image, Album, Comment, Report
+from .models import Image, Album, Comment, Report, UploadSession
 
 from django import forms
 from .models import Image
@@ -81,6 +85,46 @@ class MultipleImageForm(forms.Form):
             self.fields.pop('album')
 
 
+class ChunkedUploadForm(forms.ModelForm):
+    """
+    Starts a chunked upload (fotodb/views/chunked_upload_views.py): the file name, size and SHA-256 of the file,
+    and the options of the image.
+    """
+    class Meta:
+        model = UploadSession
+        fields = ['filename', 'size', 'checksum', 'title', 'is_private', 'album', 'category']
+
+    def __init__(self, user=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.user = user
+        if self.user and self.user.is_authenticated:
+            self.fields['album'].queryset = Album.objects.filter(user=self.user)
+        else:
+            self.fields.pop('is_private')
+            self.fields.pop('album')
+
+    def clean_filename(self):
+        filename = self.cleaned_data['filename']
+        # the same extensions as the image field of the upload forms
+        validate_image_file_extension(File(None, filename))
+        return filename
+
+    def clean_size(self):
+        size = self.cleaned_data['size']
+        if size == 0:
+            raise forms.ValidationError('The file is empty.')
+        # the limit of the upload forms, the chunks only make the upload resumable
+        if size > ImageForm.MAX_FILE_SIZE:
+            raise forms.ValidationError(f'File size cannot exceed {ImageForm.MAX_FILE_SIZE / 1024 / 1024:.0f} MB!')
+        return size
+
+    def clean_checksum(self):
+        checksum = self.cleaned_data['checksum'].lower()
+        if not re.fullmatch('[0-9a-f]{64}', checksum):
+            raise forms.ValidationError('The checksum must be the SHA-256 of the file in hexadecimal.')
+        return checksum
+
+
 
 
 
@@ -0,0 +1,142 @@
+import logging
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from fotodb.models import Job
+
+logger = logging.getLogger(__name__)
+
+# job name -> function, filled by the @job decorator (the jobs are defined in fotodb/tasks.py)
+JOBS = {}
+
+
+def job(name):
+    """
+    Register the decorated function as a background job, it is called with the enqueued payload as keyword arguments.
+    """
+    def decorator(func):
+        JOBS[name] = func
+        return func
+
+    return decorator
+
+
+def enqueue(job_name, /, **payload):
+    """
+    Add a job to the queue and return at once, the work is done by the 'run_jobs' worker.
+    The payload has to be JSON serializable (ids, numbers and strings, not model instances).
+    """
+    if job_name not in JOBS:
+        raise ValueError(f'Unknown job: {job_name}')
+    return Job.objects.create(name=job_name, payload=payload, max_attempts=settings.JOB_MAX_ATTEMPTS)
+
+
+def enqueue_many(job_name, payloads):
+    """
+    Add one job per payload to the queue with a single INSERT (e.g. for the images of a bulk upload).
+    """
+    if job_name not in JOBS:
+        raise ValueError(f'Unknown job: {job_name}')
+    return Job.objects.bulk_create(
+        [Job(name=job_name, payload=payload, max_attempts=settings.JOB_MAX_ATTEMPTS) for payload in payloads]
+    )
+
+
+def retry_delay(attempts):
+    """
+    Exponential backoff: JOB_RETRY_DELAY seconds after the first failure, then twice as long after each next one.
+    """
+    return timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (attempts - 1))
+
+
+def claim_next_job():
+    """
+    Mark the oldest due pending job as running and return it, or None if there is nothing to do.
+    The claim is a conditional UPDATE, so several workers never run the same job.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(status=Job.PENDING, run_after__lte=now).order_by('run_after', 'pk')
+    for job_id in due.values_list('pk', flat=True)[:10]:
+        claimed = Job.objects.filter(pk=job_id, status=Job.PENDING).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, updated_at=now,
+        )
+        if claimed:
+            return Job.objects.get(pk=job_id)
+    return None
+
+
+def _heartbeat(job_id, stop):
+    """
+    Refresh updated_at of the running job every JOB_HEARTBEAT_INTERVAL seconds until stop is set,
+    so a long job isn't taken for the job of a stopped worker (requeue_stale_jobs) and run a second time.
+    """
+    try:
+        while not stop.wait(settings.JOB_HEARTBEAT_INTERVAL):
+            Job.objects.filter(pk=job_id, status=Job.RUNNING).update(updated_at=timezone.now())
+    finally:
+        connection.close()
+
+
+def run_job(job):
+    """
+    Run a claimed job, then mark it done, or schedule a retry with backoff (failed after max_attempts).
+    """
+    stop = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job.pk, stop), daemon=True)
+    heartbeat.start()
+    try:
+        JOBS[job.name](**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+    else:
+        error = None
+    finally:
+        stop.set()
+        heartbeat.join()
+
+    if error is not None:
+        job.last_error = error
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            logger.error('Job %s failed after %s attempts', job, job.attempts)
+        else:
+            job.status = Job.PENDING
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+            logger.warning('Job %s failed, retrying at %s', job, job.run_after)
+    else:
+        job.status = Job.DONE
+    job.save(update_fields=['status', 'run_after', 'last_error', 'updated_at'])
+    return job
+
+
+def run_next_job():
+    """
+    Claim and run the next due job. Returns the job, or None if the queue is empty.
+    """
+    job = claim_next_job()
+    if job is not None:
+        run_job(job)
+    return job
+
+
+def requeue_stale_jobs():
+    """
+    Put back in the queue the jobs left 'running' by a worker that stopped in the middle of them
+    (their heartbeat stopped for JOB_STALE_TIMEOUT seconds). A job that already used its max_attempts is marked
+    failed instead: it may be what stopped the worker (e.g. out of memory on a huge image), it would never end.
+    Returns the number of jobs queued again.
+    """
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, updated_at__lt=now - timedelta(seconds=settings.JOB_STALE_TIMEOUT))
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, last_error='the worker stopped while running the job', updated_at=now,
+    )
+    if failed:
+        logger.error('%s jobs failed: their worker stopped during their last attempt', failed)
+    return stale.filter(attempts__lt=F('max_attempts')).update(status=Job.PENDING, run_after=now, updated_at=now)
@@ -0,0 +1,56 @@
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from fotodb.blobs import file_digest, release_image_file
+from fotodb.caching import invalidate
+from fotodb.models import Image, ImageBlob
+
+
+class Command(BaseCommand):
+    """
+    Attach the images uploaded before content-addressed storage to blobs (see fotodb/blobs.py).
+    The first file with a given content is kept where it is, the images with the same content are pointed at it
+    and their duplicate files are deleted.
+    usage: python manage.py backfill_image_blobs
+    """
+    help = 'Deduplicate the files of the images uploaded before content-addressed storage.'
+
+    def handle(self, *args, **options):
+        images = Image.objects.filter(blob__isnull=True).exclude(image='').exclude(image__isnull=True).order_by('pk')
+
+        attached = 0
+        duplicates = 0
+        missing = 0
+        for image in images.iterator():
+            name = image.image.name
+            try:
+                with default_storage.open(name, 'rb') as f:
+                    digest, size = file_digest(File(f))
+            except FileNotFoundError:
+                missing += 1
+                continue
+
+            with transaction.atomic():
+                blob = ImageBlob.objects.filter(sha256=digest).first()
+                if blob is None:
+                    blob = ImageBlob.objects.create(sha256=digest, name=name, size=size)
+                ImageBlob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+                if blob.name == name:
+                    Image.objects.filter(pk=image.pk).update(blob=blob)
+                else:
+                    # the renditions of the stored file, as recorded on the images already using it
+                    renditions = Image.objects.filter(image=blob.name).values_list('renditions', flat=True).first()
+                    Image.objects.filter(pk=image.pk).update(blob=blob, image=blob.name, renditions=renditions or [])
+                    # deleted unless another image still uses this file
+                    release_image_file(None, name)
+                    # the cached pages still link to the released file
+                    invalidate('feed', f'image:{image.pk}', f'album:{image.album_id}')
+                    duplicates += 1
+            attached += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{attached} images attached, {duplicates} duplicate files released, {missing} files not found.'
+        ))
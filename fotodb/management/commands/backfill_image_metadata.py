@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from fotodb.models import Image
+
+
+class Command(BaseCommand):
+    """
+    Store width, height, file size and format on the images uploaded before these columns existed.
+    usage: python manage.py backfill_image_metadata [--all]
+    """
+    help = 'Fill in the stored file information (dimensions, size, format) of the uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Refresh the images that already have the information.')
+
+    def handle(self, *args, **options):
+        images = Image.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        if not options['all']:
+            images = images.filter(file_size__isnull=True)
+
+        updated = 0
+        missing = 0
+        for image in images.iterator():
+            try:
+                image.update_file_metadata()
+            except FileNotFoundError:
+                missing += 1
+                continue
+            image.save(update_fields=['width', 'height', 'file_size', 'mime_type'])
+            updated += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} images updated, {missing} files not found.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from fotodb.chunked_uploads import discard_upload, expired_uploads
+
+
+class Command(BaseCommand):
+    """
+    Remove the chunked uploads older than CHUNKED_UPLOAD_EXPIRY and their staging files.
+    usage: python manage.py clear_chunked_uploads
+    """
+    help = 'Remove the expired chunked uploads and their staging files.'
+
+    def handle(self, *args, **options):
+        removed = 0
+        for upload in expired_uploads().iterator():
+            discard_upload(upload)
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{removed} uploads removed.'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from fotodb.models import Image
+from fotodb.similarity import PHASH_FIELDS, set_perceptual_hash
+
+
+class Command(BaseCommand):
+    """
+    Compute the perceptual hash (near-duplicate search) of the images uploaded before it existed.
+    usage: python manage.py compute_image_hashes [--all]
+    """
+    help = 'Compute the missing perceptual hashes of the uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Recompute the hashes that already exist.')
+
+    def handle(self, *args, **options):
+        images = Image.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        if not options['all']:
+            images = images.filter(phash__isnull=True)
+
+        updated = 0
+        failed = 0
+        for image in images.iterator():
+            if set_perceptual_hash(image):
+                image.save(update_fields=PHASH_FIELDS)
+                updated += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'{updated} images hashed, {failed} files could not be read.'))
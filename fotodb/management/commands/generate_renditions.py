@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from fotodb.models import Image
+from fotodb.renditions import generate_renditions
+
+
+class Command(BaseCommand):
+    """
+    Backfill the thumbnail/detail renditions for the images uploaded before renditions existed.
+    usage: python manage.py generate_renditions [--force]
+    """
+    help = 'Generate the missing renditions of the uploaded images.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Re-create renditions that already exist.')
+
+    def handle(self, *args, **options):
+        images = Image.objects.exclude(image='').exclude(image__isnull=True).order_by('pk')
+        processed = 0
+        generated = 0
+
+        for image in images.iterator():
+            written = generate_renditions(image, force=options['force'])
+            processed += 1
+            generated += len(written)
+
+        self.stdout.write(self.style.SUCCESS(f'{generated} renditions generated for {processed} images.'))
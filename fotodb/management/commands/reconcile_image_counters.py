@@ -0,0 +1,58 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from fotodb.models import Image, ImageBlob, Like, Comment, Favorite
+
+# counter field on Image -> model holding the counted rows
+COUNTED_MODELS = {
+    'like_count': Like,
+    'comment_count': Comment,
+    'favorite_count': Favorite,
+}
+
+
+def actual_count(model, field='image'):
+    """
+    Subquery counting the rows of the model that point (through field) to the outer Image, or ImageBlob.
+    """
+    rows = model.objects.filter(**{field: OuterRef('pk')}).values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(rows), 0)
+
+
+class Command(BaseCommand):
+    """
+    Repair drift of the denormalized like/comment/favorite counters on Image
+    (e.g. after users were deleted, which removes their likes without going through the views),
+    and of the reference counts of the stored files (ImageBlob.ref_count).
+    usage: python manage.py reconcile_image_counters [--dry-run]
+    """
+    help = 'Recount the likes, comments and favorites of every image and fix the stored counters.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report the number of images out of sync.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        annotations = {f'actual_{field}': actual_count(model) for field, model in COUNTED_MODELS.items()}
+        out_of_sync = Q()
+        for field in COUNTED_MODELS:
+            out_of_sync |= ~Q(**{field: F(f'actual_{field}')})
+
+        drifted = list(Image.objects.annotate(**annotations).filter(out_of_sync).values_list('pk', flat=True))
+
+        if not options['dry_run']:
+            batch_size = options['batch_size']
+            for start in range(0, len(drifted), batch_size):
+                Image.objects.filter(pk__in=drifted[start:start + batch_size]).update(
+                    **{field: actual_count(model) for field, model in COUNTED_MODELS.items()}
+                )
+
+        drifted_blobs = list(ImageBlob.objects.annotate(actual=actual_count(Image, 'blob'))
+                             .exclude(ref_count=F('actual')).values_list('pk', flat=True))
+        if not options['dry_run']:
+            ImageBlob.objects.filter(pk__in=drifted_blobs).update(ref_count=actual_count(Image, 'blob'))
+
+        action = 'out of sync' if options['dry_run'] else 'reconciled'
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted)} images {action}.'))
+        self.stdout.write(self.style.SUCCESS(f'{len(drifted_blobs)} file reference counts {action}.'))
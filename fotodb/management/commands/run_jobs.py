@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from fotodb.jobs import run_next_job, requeue_stale_jobs
+from fotodb.models import Job
+
+
+class Command(BaseCommand):
+    """
+    Background worker processing the job queue (image renditions, resizing, contact emails).
+    usage: python manage.py run_jobs [--once] [--sleep SECONDS]
+    Several workers can run at the same time.
+    """
+    help = 'Process the queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit when there are no more due jobs.')
+        parser.add_argument('--sleep', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+
+    def handle(self, *args, **options):
+        requeue_stale_jobs()
+        processed = 0
+
+        while True:
+            job = run_next_job()
+            if job is None:
+                if options['once']:
+                    break
+                time.sleep(options['sleep'])
+                requeue_stale_jobs()
+                continue
+
+            processed += 1
+            if job.status != Job.DONE:
+                self.stderr.write(f'{job}: attempt {job.attempts} failed')
+
+        self.stdout.write(self.style.SUCCESS(f'{processed} jobs processed.'))
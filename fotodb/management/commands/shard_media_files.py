@@ -0,0 +1,107 @@
+import hashlib
+import os
+import re
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from fotodb.caching import invalidate
+from fotodb.models import Image, ImageBlob, shard_name
+from fotodb.renditions import RENDITION_SIZES, rendition_name
+
+# names of the files stored flat in media/images/, before the sharded layout
+FLAT_NAME_REGEX = r'^images/[^/]+$'
+SHA256_REGEX = re.compile('[0-9a-f]{64}')
+
+
+def sharded_target(name):
+    """
+    New name of a flat file. Always the same for a given name, so an interrupted run can be resumed:
+    content-addressed files (see fotodb/blobs.py) go where new uploads of the same content go,
+    the others are spread by the MD5 of their name.
+    """
+    filename = os.path.basename(name)
+    stem = os.path.splitext(filename)[0]
+    key = stem if SHA256_REGEX.fullmatch(stem) else hashlib.md5(name.encode()).hexdigest()
+    return shard_name(key, filename)
+
+
+def link_file(old, new):
+    """
+    Make the file available under its new name as a hard link (no copy, the old name keeps working
+    until the database is updated). Returns False if the file is missing under both names.
+    """
+    old_path = default_storage.path(old)
+    new_path = default_storage.path(new)
+    if os.path.exists(new_path):
+        return True
+    if not os.path.exists(old_path):
+        return False
+    os.makedirs(os.path.dirname(new_path), exist_ok=True)
+    os.link(old_path, new_path)
+    return True
+
+
+def unlink_file(name):
+    try:
+        os.remove(default_storage.path(name))
+    except FileNotFoundError:
+        pass
+
+
+class Command(BaseCommand):
+    """
+    Move the files stored flat in media/images/ into the sharded layout (images/ab/cd/...), with their renditions,
+    and update Image.image and ImageBlob.name. It works online, in batches, and can be interrupted and run again:
+    each file is first hard-linked under its new name, then the rows are updated, then the old name is removed.
+    usage: python manage.py shard_media_files [--batch-size N] [--sleep SECONDS]
+    """
+    help = 'Move the flat media/images/ files into the two-level sharded layout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--sleep', type=float, default=0, help='Pause between batches, to limit the load.')
+
+    def handle(self, *args, **options):
+        moved = 0
+        missing = []
+        while True:
+            names = list(
+                Image.objects.filter(image__regex=FLAT_NAME_REGEX).exclude(image__in=missing)
+                .order_by('image').values_list('image', flat=True).distinct()[:options['batch_size']]
+            )
+            if not names:
+                break
+
+            targets = {}
+            for name in names:
+                target = sharded_target(name)
+                if not link_file(name, target):
+                    missing.append(name)
+                    continue
+                for label in RENDITION_SIZES:
+                    link_file(rendition_name(name, label), rendition_name(target, label))
+                targets[name] = target
+
+            with transaction.atomic():
+                # the cached pages link to the old names, which are removed below
+                pages = Image.objects.filter(image__in=targets).values_list('pk', 'album_id')
+                invalidate('feed', *{namespace for pk, album_id in pages
+                                     for namespace in (f'image:{pk}', f'album:{album_id}')})
+                for name, target in targets.items():
+                    Image.objects.filter(image=name).update(image=target)
+                    ImageBlob.objects.filter(name=name).update(name=target)
+
+            for name in targets:
+                unlink_file(name)
+                for label in RENDITION_SIZES:
+                    unlink_file(rendition_name(name, label))
+            moved += len(targets)
+
+            self.stdout.write(f'{moved} files moved...')
+            if options['sleep']:
+                time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'{moved} files moved, {len(missing)} files not found.'))
@@ -0,0 +1,128 @@
+import os
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+try:
+    from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+    from prometheus_client.core import GaugeMetricFamily
+    from prometheus_client.multiprocess import MultiProcessCollector
+except ImportError:  # optional: without it nothing is measured and /metrics answers 404
+    generate_latest = None
+
+# Prometheus metrics, exported at /metrics (see views/metrics_views.py).
+# With several processes (uvicorn --workers, the run_jobs worker), PROMETHEUS_MULTIPROC_DIR must be set to an empty
+# directory shared by them before they start: every process writes its values there, and /metrics adds them up,
+# whichever process answers the scrape.
+if generate_latest is not None:
+    REQUEST_DURATION = Histogram(
+        'fotodb_request_duration_seconds', 'Time to answer a request, by url name', ['view', 'method'],
+        registry=None,
+    )
+    UPLOADS = Counter('fotodb_uploads', 'Uploaded images, by upload path', ['source'], registry=None)
+    UPLOAD_BYTES = Counter('fotodb_upload_bytes', 'Size of the uploaded images, by upload path', ['source'],
+                           registry=None)
+    IMAGE_PROCESSING = Histogram(
+        'fotodb_image_processing_seconds', 'Pillow processing time, by operation', ['operation'],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+        registry=None,
+    )
+    CACHE_LOOKUPS = Counter('fotodb_cache_lookups', 'Lookups of the cached pages, by cache and result',
+                            ['cache', 'result'], registry=None)
+    METRICS = (REQUEST_DURATION, UPLOADS, UPLOAD_BYTES, IMAGE_PROCESSING, CACHE_LOOKUPS)
+
+# the method label of the requests, any other method is 'other': the clients choose it, every value would be a new
+# time series otherwise
+METHODS = ('GET', 'HEAD', 'POST', 'PUT', 'DELETE')
+
+
+def enabled():
+    return generate_latest is not None and settings.PROMETHEUS_METRICS
+
+
+def count_upload(source, size):
+    """
+    source: 'file' or 'url' (upload form), 'multiple' (multiple upload form), 'chunked' (chunked upload API)
+    """
+    if enabled():
+        UPLOADS.labels(source).inc()
+        UPLOAD_BYTES.labels(source).inc(size or 0)
+
+
+def observe_image_processing(operation, seconds):
+    if enabled():
+        IMAGE_PROCESSING.labels(operation).observe(seconds)
+
+
+def count_cache_lookup(cache, hit):
+    """
+    cache: 'page' (pages of the anonymous visitors) or 'etag' (304 Not Modified answers)
+    """
+    if enabled():
+        CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def export(gauges=None):
+    """
+    The metrics in the Prometheus text format, with the values of all the processes in multiprocess mode,
+    and gauges ({name: (description, value)}) measured by the caller at scrape time.
+    Returns (content, content type).
+    """
+    registry = CollectorRegistry()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        MultiProcessCollector(registry)
+    else:
+        for metric in METRICS:
+            registry.register(metric)
+    if gauges:
+        registry.register(_ScrapeGauges(gauges))
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class _ScrapeGauges:
+    # measured by the process answering the scrape, they aren't stored per process
+    def __init__(self, gauges):
+        self.gauges = gauges
+
+    def collect(self):
+        for name, (documentation, value) in self.gauges.items():
+            yield GaugeMetricFamily(name, documentation, value=value)
+
+
+class MetricsMiddleware:
+    """
+    Observes the time of every request in fotodb_request_duration_seconds, by url name ('unresolved' for the
+    urls without a view) and method (METHODS). Not used when prometheus_client isn't installed or PROMETHEUS_METRICS
+    is off. Sync and async, as django.utils.deprecation.MiddlewareMixin.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        start = perf_counter()
+        response = self.get_response(request)
+        self.observe(request, perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        start = perf_counter()
+        response = await self.get_response(request)
+        self.observe(request, perf_counter() - start)
+        return response
+
+    def observe(self, request, seconds):
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or 'unresolved'
+        method = request.method if request.method in METHODS else 'other'
+        REQUEST_DURATION.labels(url_name, method).observe(seconds)
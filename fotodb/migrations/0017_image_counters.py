@@ -0,0 +1,45 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:26
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Image = apps.get_model('fotodb', 'Image')
+
+    def count_of(model_name):
+        rows = apps.get_model('fotodb', model_name).objects.filter(image=OuterRef('pk'))
+        return Coalesce(Subquery(rows.values('image').annotate(count=Count('pk')).values('count')), 0)
+
+    Image.objects.update(
+        like_count=count_of('Like'),
+        comment_count=count_of('Comment'),
+        favorite_count=count_of('Favorite'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotodb', '0016_image_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='image',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
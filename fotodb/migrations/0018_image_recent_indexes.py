@@ -0,0 +1,21 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotodb', '0017_image_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['-uploaded_at', '-id'], name='image_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='image',
+            index=models.Index(fields=['category', '-uploaded_at', '-id'], name='image_category_recent_idx'),
+        ),
+    ]
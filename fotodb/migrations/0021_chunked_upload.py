@@ -0,0 +1,47 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:38
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('fotodb', '0020_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('size', models.PositiveBigIntegerField()),
+                ('chunk_size', models.PositiveIntegerField()),
+                ('checksum', models.CharField(max_length=64)),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('finalizing', 'Finalizing'), ('complete', 'Complete')], default='uploading', max_length=20)),
+                ('title', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_private', models.BooleanField(default=False)),
+                ('category', models.CharField(blank=True, choices=[(None, '---'), ('animal', 'Animal'), ('human', 'Human'), ('nature', 'Nature'), ('sports', 'Sports'), ('food', 'Food'), ('architecture', 'Architecture'), ('technology', 'Technology'), ('travel', 'Travel'), ('music', 'Music'), ('art', 'Art'), ('other', 'Other')], default=None, max_length=255, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('album', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='fotodb.album')),
+                ('image', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='fotodb.image')),
+                ('user', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UploadChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('index', models.PositiveIntegerField()),
+                ('upload', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='fotodb.uploadsession')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='uploadchunk',
+            constraint=models.UniqueConstraint(fields=('upload', 'index'), name='upload_chunk_unique'),
+        ),
+    ]
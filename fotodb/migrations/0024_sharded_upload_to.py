@@ -0,0 +1,19 @@
+# Generated by Django 4.2.11 on 2026-10-18 07:46
+
+from django.db import migrations, models
+import fotodb.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotodb', '0023_perceptual_hash'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='image',
+            name='image',
+            field=models.ImageField(blank=True, null=True, upload_to=fotodb.models.image_upload_to),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.11 on 2026-10-18 08:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('fotodb', '0025_image_name_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='image',
+            name='renditions',
+            field=models.JSONField(blank=True, default=list),
+        ),
+    ]
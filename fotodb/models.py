@@ -1,7 +1,32 @@
+import uuid
+
+from PIL import Image as PILImage, UnidentifiedImageError
 from django.db import models
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 
 from django.contrib.auth.models import User
 
+# Custom:
+from fotodb.performance import pillow_timer
+
+
+def shard_name(key, filename, root='images'):
+    """
+    Storage name fanned out in a two-level directory tree by the first four hex digits of key,
+    e.g. shard_name('9f86d0...', 'cat.jpg') -> 'images/9f/86/cat.jpg' (65536 directories, a few files in each).
+    """
+    return f'{root}/{key[:2]}/{key[2:4]}/{filename}'
+
+
+def image_upload_to(instance, filename):
+    """
+    upload_to of Image.image. The uploads normally go through fotodb/blobs.py, which shards by content hash,
+    this covers the files saved through the field itself (e.g. the admin).
+    """
+    return shard_name(uuid.uuid4().hex, filename)
+
 
 # Album model
 class Album(models.Model):
@@ -12,6 +37,19 @@ class Album(models.Model):
         return self.title
 
 
+# a stored file, named after the SHA-256 of its content (see fotodb/blobs.py). Images uploaded with the same bytes
+# share one blob, ref_count is the number of images pointing at it and the file is deleted with the last of them.
+class ImageBlob(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    name = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return self.name
+
+
 # Image uploading model. options are (Title/Upload Photo/Select Album/Category/public or private)
 class Image(models.Model):
     CATEGORY_CHOICES = (
@@ -30,16 +68,84 @@ class Image(models.Model):
     )
 
     title = models.CharField(max_length=255, blank=True, null=True)
-    image = models.ImageField(upload_to='images/', blank=True, null=True)
+    # indexed: the media files are looked up by name for the permission check (ProtectedMediaView)
+    image = models.ImageField(upload_to=image_upload_to, blank=True, null=True, db_index=True)
+    # the content-addressed file of the image (image.name == blob.name), empty for images uploaded before blobs existed
+    blob = models.ForeignKey(ImageBlob, on_delete=models.PROTECT, blank=True, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
     album = models.ForeignKey(Album, on_delete=models.CASCADE, blank=True, null=True)
     is_private = models.BooleanField(default=False)
     category = models.CharField(max_length=255, choices=CATEGORY_CHOICES, default=None, blank=True, null=True)
+    # file information stored on upload, so showing it doesn't require opening the file
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    file_size = models.PositiveBigIntegerField(blank=True, null=True)
+    mime_type = models.CharField(max_length=50, blank=True, null=True)
+    # labels of the renditions generated for the current file (see fotodb/renditions.py), so the pages don't have to
+    # check the storage for every image they show
+    renditions = models.JSONField(default=list, blank=True)
+    # denormalized counters, kept in sync by the views (see increment_counter) and the reconcile_image_counters command
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    favorite_count = models.PositiveIntegerField(default=0)
+    # 64-bit perceptual hash of the picture (two's complement) and its four 16-bit bands, indexed separately
+    # to look up near-duplicates (see fotodb/similarity.py)
+    phash = models.BigIntegerField(blank=True, null=True)
+    phash_band0 = models.PositiveIntegerField(blank=True, null=True)
+    phash_band1 = models.PositiveIntegerField(blank=True, null=True)
+    phash_band2 = models.PositiveIntegerField(blank=True, null=True)
+    phash_band3 = models.PositiveIntegerField(blank=True, null=True)
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the recent feed, see fotodb.pagination.CursorPaginator
+            models.Index(fields=['-uploaded_at', '-id'], name='image_recent_idx'),
+            models.Index(fields=['category', '-uploaded_at', '-id'], name='image_category_recent_idx'),
+            # a user's gallery (MyPhotosView, UserImageViewAdmin), optionally filtered by category
+            models.Index(fields=['user', '-uploaded_at'], name='image_user_recent_idx'),
+            models.Index(fields=['user', 'category', '-uploaded_at'], name='image_user_category_idx'),
+            # near-duplicate lookup by perceptual hash bands (multi-index hashing)
+            models.Index(fields=['phash_band0'], name='image_phash_band0_idx'),
+            models.Index(fields=['phash_band1'], name='image_phash_band1_idx'),
+            models.Index(fields=['phash_band2'], name='image_phash_band2_idx'),
+            models.Index(fields=['phash_band3'], name='image_phash_band3_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def increment_counter(self, field, amount=1):
+        """
+        Add amount (negative to decrease) to one of the like/comment/favorite counters.
+        The update is done in the database with an F() expression, so concurrent requests don't overwrite each other.
+        """
+        Image.objects.filter(pk=self.pk).update(**{field: Greatest(F(field) + amount, 0)})
+
+    def update_file_metadata(self):
+        """
+        Read the width, height, size and format of the current image file (only the file header is parsed)
+        and store them on the instance. The caller is responsible for saving the instance.
+        """
+        if not self.image:
+            return
+
+        self.file_size = self.image.size
+        # a new upload is still an open (uploaded) file, a stored one is opened from the storage
+        committed = self.image._committed
+        file = self.image.storage.open(self.image.name, 'rb') if committed else self.image.file
+        try:
+            with pillow_timer('metadata'), PILImage.open(file) as img:
+                self.width, self.height = img.size
+                self.mime_type = img.get_format_mimetype()
+        except UnidentifiedImageError:
+            self.width = self.height = self.mime_type = None
+        finally:
+            if committed:
+                file.close()
+            else:
+                file.seek(0)
+
 
 # photo comment section, has the user and the image as foreign keys, text and created_at
 class Comment(models.Model):
@@ -48,6 +154,12 @@ class Comment(models.Model):
     text = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # comments of an image, newest first (ImageDetailView)
+            models.Index(fields=['image', '-created_at'], name='comment_image_created_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.username} - {self.created_at}'
 
@@ -66,9 +178,99 @@ class Favorite(models.Model):
     image = models.ForeignKey(Image, on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # favorites of a user, most recently added first (MyFavoriteView)
+            models.Index(fields=['user', '-created_at'], name='favorite_user_created_idx'),
+        ]
+
 
 class Report(models.Model):
     reporter = models.ForeignKey(User, on_delete=models.CASCADE)
     image = models.ForeignKey(Image, on_delete=models.CASCADE)
     reason = models.TextField()
-    reported_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    reported_at = models.DateTimeField(auto_now_add=True)
+
+
+# background work queue (see fotodb/jobs.py), processed by 'python manage.py run_jobs'
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_after = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # the worker picks the pending jobs that are due, oldest first
+            models.Index(fields=['status', 'run_after'], name='job_due_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+# resumable upload of a large file in chunks (see fotodb/chunked_uploads.py), the id is only known to the uploader
+class UploadSession(models.Model):
+    UPLOADING = 'uploading'
+    FINALIZING = 'finalizing'
+    COMPLETE = 'complete'
+    STATUS_CHOICES = (
+        (UPLOADING, 'Uploading'),
+        (FINALIZING, 'Finalizing'),
+        (COMPLETE, 'Complete'),
+    )
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # SHA-256 (hex) of the whole file, given by the client and checked when the upload is finalized
+    checksum = models.CharField(max_length=64)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=UPLOADING)
+    # the options of the Image created at the end
+    title = models.CharField(max_length=255, blank=True, null=True)
+    album = models.ForeignKey(Album, on_delete=models.CASCADE, blank=True, null=True)
+    is_private = models.BooleanField(default=False)
+    category = models.CharField(max_length=255, choices=Image.CATEGORY_CHOICES, default=None, blank=True, null=True)
+    image = models.ForeignKey(Image, on_delete=models.SET_NULL, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.filename} ({self.status})'
+
+    @property
+    def total_chunks(self):
+        return max(1, -(-self.size // self.chunk_size))
+
+    def chunk_length(self, index):
+        """
+        Expected number of bytes of a chunk: chunk_size, except for the last one.
+        """
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+
+
+class UploadChunk(models.Model):
+    upload = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='chunks')
+    index = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['upload', 'index'], name='upload_chunk_unique'),
+        ]
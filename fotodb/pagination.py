@@ -0,0 +1,112 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+# the range of the primary keys (64 bit integers), a larger pk in a cursor would overflow the query parameter
+PK_RANGE = range(-2 ** 63, 2 ** 63)
+
+
+class CursorPage:
+    """
+    One page of a CursorPaginator. Iterating gives the objects of the page (newest first).
+    next_cursor/previous_cursor are the opaque values to put in the '?cursor=' of the next/previous page links.
+    """
+
+    def __init__(self, object_list, has_next, has_previous, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.has_next = has_next
+        self.has_previous = has_previous
+        self.next_cursor = next_cursor if has_next else None
+        self.previous_cursor = previous_cursor if has_previous else None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+class CursorPaginator:
+    """
+    Keyset (cursor) pagination over a queryset ordered by (field, pk) descending, e.g. newest images first.
+
+    Unlike django's Paginator it doesn't run a COUNT(*) and doesn't use OFFSET: a page is fetched with
+    "WHERE field <= last seen AND (field < last seen OR pk < last seen pk) ORDER BY field DESC, pk DESC LIMIT n",
+    which is an index range scan, so every page costs the same as the first one.
+    The queryset field must be backed by an index on (field, id) (see Image.Meta.indexes).
+    """
+
+    def __init__(self, queryset, per_page, field='uploaded_at'):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.field = field
+
+    def encode_cursor(self, direction, obj):
+        value = getattr(obj, self.field).isoformat()
+        raw = f'{direction}|{value}|{obj.pk}'.encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """
+        Returns (direction, value, pk) of the cursor, or None if the cursor is missing or not valid: the cursors
+        made by encode_cursor have an aware datetime and a pk of PK_RANGE.
+        """
+        if not cursor:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+            direction, value, pk = raw.split('|')
+            value, pk = datetime.fromisoformat(value), int(pk)
+            if direction not in ('n', 'p') or value.tzinfo is None or pk not in PK_RANGE:
+                return None
+            return direction, value, pk
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+
+    def get_page(self, cursor=None):
+        """
+        Returns the CursorPage for the cursor, invalid or missing cursors give the first page.
+        """
+        field = self.field
+        decoded = self.decode_cursor(cursor)
+        # one more row than needed tells if there is another page after this one
+        limit = self.per_page + 1
+
+        if decoded is None:
+            rows = list(self.queryset.order_by(f'-{field}', '-pk')[:limit])
+            has_next, has_previous = len(rows) > self.per_page, False
+            rows = rows[:self.per_page]
+        else:
+            direction, value, pk = decoded
+            if direction == 'n':
+                # the plain range condition lets the database seek into the index, the OR breaks the ties
+                rows = list(self.queryset.filter(
+                    Q(**{f'{field}__lte': value}),
+                    Q(**{f'{field}__lt': value}) | Q(pk__lt=pk),
+                ).order_by(f'-{field}', '-pk')[:limit])
+                has_next, has_previous = len(rows) > self.per_page, True
+                rows = rows[:self.per_page]
+            else:
+                rows = list(self.queryset.filter(
+                    Q(**{f'{field}__gte': value}),
+                    Q(**{f'{field}__gt': value}) | Q(pk__gt=pk),
+                ).order_by(field, 'pk')[:limit])
+                has_next, has_previous = True, len(rows) > self.per_page
+                rows = rows[:self.per_page][::-1]
+
+        if not rows:
+            # past the end (e.g. the images were deleted): the previous link leads back to the first page
+            return CursorPage(rows, False, decoded is not None)
+
+        return CursorPage(
+            rows,
+            has_next,
+            has_previous,
+            next_cursor=self.encode_cursor('n', rows[-1]),
+            previous_cursor=self.encode_cursor('p', rows[0]),
+        )
@@ -0,0 +1,178 @@
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+# Custom:
+from fotodb.metrics import observe_image_processing
+
+logger = logging.getLogger(__name__)
+
+# the measures of the request being handled, None outside of a request (commands, jobs worker)
+_current = ContextVar('fotodb_request_stats', default=None)
+
+# url name -> the last PERFORMANCE_WINDOW samples (wall_ms, queries, db_ms, pillow_ms, bytes), for this process
+_samples = {}
+
+MEASURES = ('wall_ms', 'queries', 'db_ms', 'pillow_ms', 'bytes')
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'pillow_time')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.pillow_time = 0.0
+
+
+def _time_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_time += perf_counter() - start
+        stats.queries += 1
+
+
+def add_query_timer(connection):
+    """
+    Count and time the queries of the requests on this database connection. Installed once per connection
+    (see signals.py) rather than on every request, outside of a request it only costs a context variable lookup.
+    """
+    if _time_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_time_query)
+
+
+@contextmanager
+def pillow_timer(operation):
+    """
+    Count the time spent in the block as Pillow processing of the current request, and observe it in the
+    fotodb_image_processing_seconds metric of the operation ('metadata', 'rendition'...), also outside a request.
+    """
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = perf_counter() - start
+        stats = _current.get()
+        if stats is not None:
+            stats.pillow_time += elapsed
+        observe_image_processing(operation, elapsed)
+
+
+def get_budget(url_name):
+    budgets = settings.PERFORMANCE_BUDGETS
+    return {**budgets.get('default', {}), **budgets.get(url_name, {})}
+
+
+def record(url_name, sample):
+    window = _samples.get(url_name)
+    if window is None:
+        window = _samples.setdefault(url_name, deque(maxlen=settings.PERFORMANCE_WINDOW))
+    window.append(sample)
+
+
+def reset_stats():
+    _samples.clear()
+
+
+def _percentile(ordered, fraction):
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+def summarize():
+    """
+    Aggregates of the last requests of every url name: number of requests, wall time percentiles, means of the
+    other measures and number of requests over budget.
+    """
+    summary = {}
+    for url_name, window in sorted(_samples.items()):
+        samples = list(window)
+        if not samples:
+            continue
+        wall = sorted(sample[0] for sample in samples)
+        budget = get_budget(url_name)
+        summary[url_name] = {
+            'requests': len(samples),
+            'wall_ms': {'p50': _percentile(wall, 0.5), 'p95': _percentile(wall, 0.95), 'max': wall[-1]},
+            **{f'mean_{measure}': sum(sample[i] for sample in samples) / len(samples)
+               for i, measure in enumerate(MEASURES) if measure != 'wall_ms'},
+            'over_budget': sum(
+                any(sample[i] > budget[measure] for i, measure in enumerate(MEASURES) if measure in budget)
+                for sample in samples
+            ),
+        }
+    return summary
+
+
+class PerformanceMiddleware:
+    """
+    Measures every request: wall time, number and time of the database queries, Pillow processing time
+    (see pillow_timer) and response size, kept per url name ('home', 'recent', 'image_details'...) for the last
+    PERFORMANCE_WINDOW requests (summarize, shown to the staff by PerformanceStatsView).
+    A request over one of its PERFORMANCE_BUDGETS is logged as a warning.
+    The cost is a few perf_counter() calls per request and query, nothing is written unless a budget is exceeded.
+    Sync and async, as django.utils.deprecation.MiddlewareMixin.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not settings.PERFORMANCE_MONITORING:
+            return self.get_response(request)
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, perf_counter() - start)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.PERFORMANCE_MONITORING:
+            return await self.get_response(request)
+
+        # the queries run in the threads of sync_to_async, with a copy of this context: they add to the same stats
+        stats = RequestStats()
+        token = _current.set(stats)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.record(request, response, stats, perf_counter() - start)
+        return response
+
+    def record(self, request, response, stats, wall_time):
+        match = request.resolver_match
+        url_name = (match.url_name if match else None) or 'unresolved'
+        if response.streaming:
+            size = int(response.get('Content-Length') or 0)
+        else:
+            size = len(response.content)
+        sample = (wall_time * 1000, stats.queries, stats.db_time * 1000, stats.pillow_time * 1000, size)
+        record(url_name, sample)
+
+        budget = get_budget(url_name)
+        exceeded = [f'{measure}={value:.0f} (budget {budget[measure]})'
+                    for measure, value in zip(MEASURES, sample) if measure in budget and value > budget[measure]]
+        if exceeded:
+            logger.warning('%s %s over budget: %s', request.method, request.path, ', '.join(exceeded))
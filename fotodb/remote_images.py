@@ -0,0 +1,170 @@
+import asyncio
+import os
+import tempfile
+import time
+from urllib.parse import urljoin, urlsplit
+
+import urllib3
+from django.conf import settings
+from urllib3.exceptions import (ConnectTimeoutError, HTTPError, MaxRetryError, NewConnectionError, ReadTimeoutError,
+                                ResponseError, URLSchemeUnknown)
+
+CHUNK_SIZE = 64 * 1024
+# number of bytes needed to recognise every signature below
+SIGNATURE_LENGTH = 12
+
+# file signatures ("magic bytes") of the accepted image formats -> extension used when the URL has none
+IMAGE_SIGNATURES = (
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+    (b'BM', 'bmp'),
+)
+
+
+# shared by the downloads (thread safe), keeps the connections to the hosts images are often imported from.
+# HTTPS certificates are verified
+http = urllib3.PoolManager(headers={'User-Agent': 'YPH'}, cert_reqs='CERT_REQUIRED')
+
+
+class RemoteImageError(Exception):
+    """
+    The image could not be imported from the URL, the message is shown to the user.
+    """
+
+
+class RemoteImage:
+    """
+    A downloaded image: the file name taken from the URL and the temporary file holding the bytes.
+    """
+
+    def __init__(self, name, file, content_type):
+        self.name = name
+        self.file = file
+        self.content_type = content_type
+
+    def close(self):
+        self.file.close()
+
+
+def sniff_image_type(head):
+    """
+    Return the extension matching the first bytes of a file, or None if it isn't a supported image.
+    """
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    for signature, extension in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return extension
+    return None
+
+
+def _check_signature(head):
+    extension = sniff_image_type(head)
+    if extension is None:
+        raise RemoteImageError('the URL is not a supported image (JPEG, PNG, GIF, BMP or WebP)')
+    return extension
+
+
+def _connection_error(reason):
+    """
+    RemoteImageError for the reason of a failed urllib3 request.
+    """
+    if isinstance(reason, NewConnectionError):
+        return RemoteImageError('could not connect')
+    if isinstance(reason, ConnectTimeoutError):
+        return RemoteImageError('connection timed out')
+    if isinstance(reason, ReadTimeoutError):
+        return RemoteImageError('the server stopped sending data')
+    if isinstance(reason, ResponseError):
+        return RemoteImageError('too many redirects')
+    if isinstance(reason, URLSchemeUnknown):
+        return RemoteImageError('only http and https URLs are supported')
+    return RemoteImageError('invalid response from the server')
+
+
+def _download(url):
+    """
+    Blocking download, run in a thread by fetch_remote_image.
+    """
+    deadline = time.monotonic() + settings.REMOTE_IMAGE_TOTAL_TIMEOUT
+    try:
+        response = http.request(
+            'GET', url, headers={'Accept': 'image/*'}, preload_content=False,
+            timeout=urllib3.Timeout(connect=settings.REMOTE_IMAGE_CONNECT_TIMEOUT,
+                                    read=settings.REMOTE_IMAGE_READ_TIMEOUT),
+            # redirects only: a failed request isn't repeated
+            retries=urllib3.Retry(total=None, connect=0, read=0, status=0, other=0,
+                                  redirect=settings.REMOTE_IMAGE_MAX_REDIRECTS),
+        )
+    except MaxRetryError as e:
+        raise _connection_error(e.reason)
+    except HTTPError as e:
+        raise _connection_error(e)
+
+    try:
+        if response.status != 200:
+            raise RemoteImageError(f'the server answered with status {response.status}')
+
+        content_type = response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+        if content_type and not content_type.startswith('image/') and content_type != 'application/octet-stream':
+            raise RemoteImageError(f'the URL is not an image ({content_type})')
+
+        max_bytes = settings.REMOTE_IMAGE_MAX_BYTES
+        content_length = response.headers.get('Content-Length', '')
+        if content_length.isdigit() and int(content_length) > max_bytes:
+            raise RemoteImageError(f'the image is larger than {max_bytes / 1024 / 1024:.0f} MB')
+
+        # the body is streamed to a temporary file, only one chunk at a time is kept in memory
+        file = tempfile.TemporaryFile()
+        try:
+            size = 0
+            head = b''
+            extension = None
+            for data in response.stream(CHUNK_SIZE):
+                if time.monotonic() > deadline:
+                    raise RemoteImageError('the download took too long')
+                size += len(data)
+                if size > max_bytes:
+                    raise RemoteImageError(f'the image is larger than {max_bytes / 1024 / 1024:.0f} MB')
+                if extension is None and len(head) < SIGNATURE_LENGTH:
+                    # the signature is checked as soon as its bytes arrived, before downloading the rest
+                    head += data[:SIGNATURE_LENGTH]
+                    if len(head) >= SIGNATURE_LENGTH:
+                        extension = _check_signature(head)
+                file.write(data)
+            if extension is None:
+                extension = _check_signature(head)
+        except ReadTimeoutError:
+            file.close()
+            raise RemoteImageError('the server stopped sending data')
+        except HTTPError:
+            file.close()
+            raise RemoteImageError('invalid response from the server')
+        except BaseException:
+            file.close()
+            raise
+    finally:
+        # a connection left with unread data can't be reused
+        response.close()
+        response.release_conn()
+
+    file.seek(0)
+    # the name of the last url of the redirects
+    name = os.path.basename(urlsplit(urljoin(url, response.geturl() or '')).path)
+    if not os.path.splitext(name)[1]:
+        name = f'{name or "image"}.{extension}'
+    return RemoteImage(name, file, content_type)
+
+
+async def fetch_remote_image(url):
+    """
+    Download the image at url without blocking the event loop: the urllib3 request runs in a thread.
+    Enforces the connect/read timeouts, an overall deadline and the maximum size while streaming,
+    and checks the magic bytes of the file before accepting it. Raises RemoteImageError on any failure.
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https') or not parts.hostname:
+        raise RemoteImageError('only http and https URLs are supported')
+    return await asyncio.to_thread(_download, url)
@@ -0,0 +1,143 @@
+import logging
+from io import BytesIO
+
+from PIL import Image as PILImage, ImageOps, UnidentifiedImageError
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+
+# Custom:
+from fotodb.caching import invalidate
+from fotodb.models import Image
+from fotodb.performance import pillow_timer
+
+logger = logging.getLogger(__name__)
+
+# Fixed set of pre-generated sizes (longest edge in pixels), keyed by the label used in templates.
+# 'thumb' is used by the grid pages (recent, my images, albums...), 'detail' by the image details page.
+RENDITION_SIZES = {
+    'thumb': 256,
+    'detail': 1024,
+}
+
+RENDITIONS_DIR = 'renditions'
+
+# Pillow formats that can be written back as they are, anything else is saved as JPEG.
+SAVABLE_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+
+
+def rendition_name(name, label):
+    """
+    Storage name of a rendition, e.g. 'images/cat.jpg' -> 'renditions/thumb/images/cat.jpg'.
+    The original name is kept as the suffix, so a rendition can always be traced back to its image.
+    """
+    return f'{RENDITIONS_DIR}/{label}/{name}'
+
+
+def original_name(name):
+    """
+    Name of the original image file of a media file name: the name itself for an original ('images/...'),
+    the suffix of a rendition ('renditions/<label>/images/...'), None for anything else.
+    """
+    if name.startswith('images/'):
+        return name
+    prefix, _, rest = name.partition('/')
+    label, _, original = rest.partition('/')
+    if prefix == RENDITIONS_DIR and label in RENDITION_SIZES and original.startswith('images/'):
+        return original
+    return None
+
+
+def _encode(img, image_format):
+    """
+    Encode the Pillow image into bytes with the given format, converting the color mode when the format needs it.
+    """
+    if image_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    elif image_format == 'GIF' and img.mode not in ('P', 'L'):
+        img = img.convert('P')
+
+    buffer = BytesIO()
+    options = {'quality': 85, 'optimize': True} if image_format in ('JPEG', 'WEBP') else {}
+    img.save(buffer, image_format, **options)
+    return buffer.getvalue()
+
+
+def generate_renditions(image, force=False):
+    """
+    Create every rendition of RENDITION_SIZES for the given fotodb Image instance.
+    Existing renditions are kept unless force is True (used after the original file was changed, e.g. resized).
+    The labels of the available renditions are stored on every image using the file (Image.renditions).
+    Returns the list of rendition names that were written.
+    """
+    if not image.image:
+        return []
+
+    storage = image.image.storage
+    name = image.image.name
+    available = {
+        label for label in RENDITION_SIZES
+        if not force and storage.exists(rendition_name(name, label))
+    }
+    missing = [label for label in RENDITION_SIZES if label not in available]
+
+    written = []
+    if missing:
+        try:
+            with pillow_timer('rendition'), storage.open(name, 'rb') as original, PILImage.open(original) as img:
+                image_format = img.format if img.format in SAVABLE_FORMATS else 'JPEG'
+                img = ImageOps.exif_transpose(img)
+
+                # the largest size first, so every smaller one is resized from an already reduced copy
+                for label in sorted(missing, key=RENDITION_SIZES.get, reverse=True):
+                    img.thumbnail((RENDITION_SIZES[label], RENDITION_SIZES[label]))
+                    target = rendition_name(name, label)
+                    if storage.exists(target):
+                        storage.delete(target)
+                    written.append(storage.save(target, ContentFile(_encode(img, image_format))))
+                    available.add(label)
+        except (OSError, UnidentifiedImageError) as e:
+            logger.warning('Could not generate renditions for %s: %s', name, e)
+
+    record_renditions(image, sorted(available))
+    return written
+
+
+def record_renditions(image, labels):
+    """
+    Store the labels of the renditions of the image's file on every image sharing the file (see fotodb/blobs.py),
+    and expire the cached pages of those that showed another version.
+    """
+    image.renditions = labels
+    changed = [
+        (pk, album_id) for pk, album_id, renditions
+        in Image.objects.filter(image=image.image.name).values_list('pk', 'album_id', 'renditions')
+        if renditions != labels
+    ]
+    if not changed:
+        return
+    Image.objects.filter(pk__in=[pk for pk, album_id in changed]).update(renditions=labels)
+    invalidate('feed', *{f'image:{pk}' for pk, album_id in changed},
+               *{f'album:{album_id}' for pk, album_id in changed if album_id})
+
+
+def delete_renditions(name):
+    """
+    Remove all the renditions of the given original file name.
+    """
+    for label in RENDITION_SIZES:
+        target = rendition_name(name, label)
+        if default_storage.exists(target):
+            default_storage.delete(target)
+
+
+def rendition_url(image, label):
+    """
+    URL of the requested rendition of the Image, falling back to the original file
+    when the rendition was not generated (yet). Reads Image.renditions, the storage isn't accessed.
+    """
+    if not image.image:
+        return ''
+
+    if label in image.renditions:
+        return image.image.storage.url(rendition_name(image.image.name, label))
+    return image.image.url
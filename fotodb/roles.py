@@ -0,0 +1,78 @@
+from django.core.cache import cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db.models import Q
+
+MODERATORS_GROUP = 'Moderators'
+
+# how long the roles of a user are kept in the cache. Group membership changes invalidate the entry (see signals.py)
+# in every process sharing the cache. A local-memory cache is only invalidated in the process making the change:
+# the server's other workers and the jobs worker keep the roles for LOCAL_ROLES_CACHE_TIMEOUT at most,
+# so a demoted moderator loses their rights within seconds everywhere.
+ROLES_CACHE_TIMEOUT = 5 * 60
+LOCAL_ROLES_CACHE_TIMEOUT = 10
+
+
+def roles_cache_timeout():
+    if isinstance(caches['default'], LocMemCache):
+        return LOCAL_ROLES_CACHE_TIMEOUT
+    return ROLES_CACHE_TIMEOUT
+
+
+def _cache_key(user_id):
+    return f'fotodb:roles:{user_id}'
+
+
+def get_user_roles(user):
+    """
+    Return the names of the groups the user belongs to, as a frozenset.
+    The roles are queried once and then remembered on the user object (which lives for the whole request)
+    and in the cache (shared by the next requests), so a page makes at most one role query.
+    """
+    if not user.is_authenticated:
+        return frozenset()
+
+    roles = getattr(user, '_fotodb_roles', None)
+    if roles is None:
+        roles = cache.get(_cache_key(user.pk))
+        if roles is None:
+            roles = frozenset(user.groups.values_list('name', flat=True))
+            cache.set(_cache_key(user.pk), roles, roles_cache_timeout())
+        user._fotodb_roles = roles
+    return roles
+
+
+def moderators_check(user):
+    """
+    function to check if the logged-in user belong to moderators group. used in:
+    ImageDetailView, ImageDeleteView, AlbumDeleteView, ImageEditView, the moderators views and the is_moderator filter
+    """
+    return MODERATORS_GROUP in get_user_roles(user)
+
+
+def can_view_image(user, image):
+    """
+    Public images can be viewed by everyone, private ones only by their uploader, superusers and moderators.
+    used in: ImageDetailView and the protected media files (ProtectedMediaView, through visible_images)
+    """
+    if not image.is_private:
+        return True
+    return user.is_authenticated and (user.pk == image.user_id or user.is_superuser or moderators_check(user))
+
+
+def visible_images(user, images):
+    """
+    The same rule as can_view_image, as a filter of an Image queryset.
+    """
+    if user.is_superuser or moderators_check(user):
+        return images
+    visible = Q(is_private=False)
+    if user.is_authenticated:
+        visible |= Q(user=user)
+    return images.filter(visible)
+
+
+def invalidate_user_roles(*user_ids):
+    """
+    Forget the cached roles of the given users, called when their group membership changes.
+    """
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
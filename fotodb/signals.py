@@ -1,9 +1,116 @@
 from django.core.mail import send_mail
-from django.db.models.signals import post_save
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete, pre_save, pre_delete, m2m_changed
 from django.dispatch import receiver
-from django.contrib.auth.models import User
+from django.contrib.auth.models import User, Group
 from django.conf import settings
 
+from fotodb.blobs import release_image_file
+from fotodb.caching import invalidate
+from fotodb.jobs import enqueue
+from fotodb.models import Album, Image, Comment, Like, Favorite
+from fotodb.performance import add_query_timer
+from fotodb.roles import invalidate_user_roles
+
+
+@receiver(post_save, sender=Image)
+def create_image_renditions(sender, instance, created, **kwargs):
+    """
+    Queue the generation of the thumbnail/detail renditions once a new image is uploaded.
+    """
+    if created and instance.image:
+        enqueue('process_image', image_id=instance.pk)
+
+
+@receiver(post_delete, sender=Image)
+def release_image_file_on_delete(sender, instance, **kwargs):
+    """
+    Give back the image's reference to its stored file, the file and its renditions are deleted with the last one.
+    """
+    if instance.image:
+        release_image_file(instance.blob_id, instance.image.name)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def user_groups_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Drop the cached roles (fotodb.roles) of the users whose group membership changed,
+    from either side of the relation: user.groups.add(group) or group.user_set.add(user).
+    """
+    if action == 'pre_clear':
+        # post_clear doesn't tell which users group.user_set.clear() removed, they are collected before.
+        # The cache is only cleared once the rows are deleted, a request in between would cache the old roles again
+        if reverse:
+            instance._fotodb_cleared_user_ids = list(instance.user_set.values_list('pk', flat=True))
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+
+    if not reverse:
+        instance.__dict__.pop('_fotodb_roles', None)
+        invalidate_user_roles(instance.pk)
+    elif action == 'post_clear':
+        invalidate_user_roles(*instance.__dict__.pop('_fotodb_cleared_user_ids', []))
+    else:
+        invalidate_user_roles(*pk_set)
+
+
+@receiver(post_save, sender=Group)
+@receiver(pre_delete, sender=Group)
+def group_changed(sender, instance, **kwargs):
+    # a renamed or deleted group changes the roles of all its members
+    invalidate_user_roles(*instance.user_set.values_list('pk', flat=True))
+
+
+@receiver(pre_save, sender=Image)
+def remember_previous_album(sender, instance, update_fields=None, **kwargs):
+    # an image moved to another album also leaves the cached grid of the previous one
+    if instance.pk and (update_fields is None or 'album' in update_fields):
+        instance._previous_album_id = Image.objects.filter(pk=instance.pk).values_list('album_id', flat=True).first()
+
+
+@receiver(post_save, sender=Image)
+@receiver(post_delete, sender=Image)
+def invalidate_image_pages(sender, instance, **kwargs):
+    """
+    Expire the cached pages showing the image (fotodb/caching.py): its detail page, the recent feed and its albums.
+    """
+    namespaces = {'feed', f'image:{instance.pk}'}
+    for album_id in (instance.album_id, getattr(instance, '_previous_album_id', None)):
+        if album_id:
+            namespaces.add(f'album:{album_id}')
+    invalidate(*namespaces)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def invalidate_image_counters(sender, instance, **kwargs):
+    # the detail page shows the comments and exact counts. The feed isn't expired: its counts may lag
+    # PAGE_CACHE_TIMEOUT behind, rather than every like emptying the cache of all the feed pages
+    invalidate(f'image:{instance.image_id}')
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_delete, sender=Favorite)
+def invalidate_image_favorites(sender, instance, **kwargs):
+    # the favorite button of the detail page is part of its ETag (ConditionalGetMixin)
+    invalidate(f'image:{instance.image_id}')
+
+
+@receiver(post_save, sender=Album)
+@receiver(post_delete, sender=Album)
+def invalidate_album_pages(sender, instance, **kwargs):
+    invalidate(f'album:{instance.pk}')
+
+
+
+@receiver(connection_created)
+def measure_queries(sender, connection, **kwargs):
+    # the queries of the requests are counted by PerformanceMiddleware (fotodb/performance.py)
+    add_query_timer(connection)
+
 # uncomment the following lines for the user to receive a welcome email after registration (require amending settings.py)
 # @receiver(post_save, sender=User)
 # def send_welcome_email(sender, instance, created, **kwargs):
@@ -0,0 +1,38 @@
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SALT = 'fotodb.signed_urls'
+
+
+def _signature(name, expires):
+    return salted_hmac(SALT, f'{name}:{expires}', algorithm='sha256').hexdigest()
+
+
+def sign_media_url(name, expires_in=None):
+    """
+    URL of a media file that can be opened without logging in until it expires (the shareable link of a private image).
+    The expiry is rounded up to the next hour, so the links generated during the same hour are identical
+    and can be cached.
+    """
+    expires_in = settings.MEDIA_SIGNED_URL_EXPIRY if expires_in is None else expires_in
+    expires = -(-(int(time.time()) + expires_in) // 3600) * 3600
+    return f'{default_storage.url(name)}?{urlencode({"expires": expires, "sig": _signature(name, expires)})}'
+
+
+def verify_media_signature(name, expires, signature):
+    """
+    Return the number of seconds the signed URL is still valid, or None if the signature is wrong or expired.
+    Only the URL and the SECRET_KEY are needed, there is no database lookup.
+    """
+    try:
+        expires = int(expires)
+    except (TypeError, ValueError):
+        return None
+    if not signature or not constant_time_compare(signature, _signature(name, expires)):
+        return None
+    remaining = expires - int(time.time())
+    return remaining if remaining > 0 else None
@@ -0,0 +1,108 @@
+from itertools import combinations
+
+from PIL import Image as PILImage, UnidentifiedImageError
+from django.conf import settings
+from django.db.models import Q
+
+# Custom:
+from fotodb.models import Image
+from fotodb.performance import pillow_timer
+
+HASH_SIZE = 8
+BANDS = 4
+BAND_BITS = 64 // BANDS
+BAND_MASK = (1 << BAND_BITS) - 1
+
+PHASH_FIELDS = ['phash'] + [f'phash_band{i}' for i in range(BANDS)]
+
+
+def dhash(file):
+    """
+    64-bit difference hash of a picture: the picture is reduced to 9x8 gray pixels and every bit tells whether
+    a pixel is brighter than its right neighbour. Resized or recompressed copies get the same or a close hash.
+    """
+    with pillow_timer('hash'), PILImage.open(file) as img:
+        # JPEGs are decoded directly at a reduced scale, the full size picture is never built
+        img.draft('L', (HASH_SIZE * 8, HASH_SIZE * 8))
+        pixels = list(img.convert('L').resize((HASH_SIZE + 1, HASH_SIZE), PILImage.LANCZOS).getdata())
+
+    value = 0
+    for row in range(HASH_SIZE):
+        for col in range(HASH_SIZE):
+            left = pixels[row * (HASH_SIZE + 1) + col]
+            right = pixels[row * (HASH_SIZE + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming_distance(a, b):
+    return bin((a ^ b) & ((1 << 64) - 1)).count('1')
+
+
+def hash_bands(value):
+    return [(value >> (BAND_BITS * i)) & BAND_MASK for i in range(BANDS)]
+
+
+def set_perceptual_hash(image):
+    """
+    Compute the hash of the image file and store it, with its bands, on the instance (the caller saves it).
+    The database column is signed, so the 64-bit value is stored in two's complement.
+    """
+    try:
+        with image.image.storage.open(image.image.name, 'rb') as f:
+            value = dhash(f)
+    except (OSError, UnidentifiedImageError):
+        image.phash = None
+        for i in range(BANDS):
+            setattr(image, f'phash_band{i}', None)
+        return False
+
+    image.phash = value - (1 << 64) if value >= 1 << 63 else value
+    for i, band in enumerate(hash_bands(value)):
+        setattr(image, f'phash_band{i}', band)
+    return True
+
+
+def _band_neighbours(band, radius):
+    """
+    All the band values within radius differing bits of band.
+    """
+    values = [band]
+    for distance in range(1, radius + 1):
+        for bits in combinations(range(BAND_BITS), distance):
+            flipped = band
+            for bit in bits:
+                flipped ^= 1 << bit
+            values.append(flipped)
+    return values
+
+
+def find_similar_images(image, max_distance=None, limit=None):
+    """
+    Return the images whose picture is close to the given one, as (image, distance) pairs, closest first.
+
+    Multi-index hashing: if two 64-bit hashes differ by at most max_distance bits, one of their four 16-bit bands
+    differs by at most max_distance // 4 bits (pigeonhole principle). So the candidates are fetched through the
+    indexes of the band columns, looking up the few values near each band of the hash, and only those candidates
+    are compared bit by bit. The cost depends on the number of near matches, not on the number of images.
+    """
+    if image.phash is None:
+        return []
+    max_distance = settings.SIMILAR_IMAGES_MAX_DISTANCE if max_distance is None else max_distance
+    limit = settings.SIMILAR_IMAGES_LIMIT if limit is None else limit
+
+    value = image.phash & ((1 << 64) - 1)
+    radius = max_distance // BANDS
+    candidates = Q()
+    for i, band in enumerate(hash_bands(value)):
+        candidates |= Q(**{f'phash_band{i}__in': _band_neighbours(band, radius)})
+
+    distances = {}
+    for pk, phash in Image.objects.filter(candidates).exclude(pk=image.pk).values_list('pk', 'phash'):
+        distance = hamming_distance(value, phash)
+        if distance <= max_distance:
+            distances[pk] = distance
+
+    closest = sorted(distances, key=lambda pk: (distances[pk], -pk))[:limit]
+    images = Image.objects.select_related('user').in_bulk(closest)
+    return [(images[pk], distances[pk]) for pk in closest if pk in images]
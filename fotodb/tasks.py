@@ -0,0 +1,76 @@
+from io import BytesIO
+
+from PIL import Image as PILImage
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.mail import send_mail
+from django.db import transaction
+
+# Custom:
+from fotodb.blobs import store_image_file, release_image_file
+from fotodb.jobs import job
+from fotodb.models import Image
+from fotodb.performance import pillow_timer
+from fotodb.renditions import generate_renditions
+from fotodb.similarity import PHASH_FIELDS, set_perceptual_hash
+
+
+@job('process_image')
+def process_image(image_id):
+    """
+    Post-processing of a newly uploaded image: create its renditions and compute its perceptual hash.
+    """
+    image = Image.objects.filter(pk=image_id).first()
+    if image is None:
+        # deleted before the job ran
+        return
+    generate_renditions(image)
+    if set_perceptual_hash(image):
+        image.save(update_fields=PHASH_FIELDS)
+
+
+@job('resize_image')
+def resize_image(image_id, width, height):
+    """
+    Resize the image file (ImageEditView), then refresh its stored metadata and renditions.
+    The file may be shared with other images (see fotodb/blobs.py), so the resized copy is stored as a new file.
+    """
+    image = Image.objects.filter(pk=image_id).first()
+    if image is None:
+        return
+
+    # Open the original image using Pillow
+    with pillow_timer('resize'), image.image.open('rb'), PILImage.open(image.image) as img:
+        # Resize the image using the specified width and height values
+        resized_img = img.resize((width, height))
+        image_format = img.format
+
+    # Save the resized image with the same format as the original
+    buffer = BytesIO()
+    resized_img.save(buffer, image_format)
+    old_blob_id, old_name = image.blob_id, image.image.name
+
+    with transaction.atomic():
+        store_image_file(image, ContentFile(buffer.getvalue()))
+        image.update_file_metadata()
+        set_perceptual_hash(image)
+        # the renditions of the new file are generated below
+        image.renditions = []
+        image.save(update_fields=['image', 'blob', 'width', 'height', 'file_size', 'mime_type', 'renditions',
+                                  *PHASH_FIELDS])
+        release_image_file(old_blob_id, old_name)
+    generate_renditions(image)
+
+
+@job('send_contact_emails')
+def send_contact_emails(name, email, message):
+    """
+    Send the contact form message to the site and the confirmation to the sender (ContactView).
+    """
+    subject = f'Contact Us Form from {name}'
+    message = f'Name: {name}\nEmail: {email}\nMessage: {message}'
+    send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [settings.DEFAULT_FROM_EMAIL])
+
+    user_subject = 'Thank you for contacting us!'
+    user_message = 'Thank you for contacting us. We have received your message and will get back to you soon.'
+    send_mail(user_subject, user_message, settings.DEFAULT_FROM_EMAIL, [email])
@@ -1,10 +1,32 @@
 from django import template
 
-from django.contrib.auth.models import Group
+from fotodb.renditions import rendition_url
+from fotodb.roles import moderators_check
+from fotodb.signed_urls import sign_media_url
 
 register = template.Library()
 
 
 @register.filter
 def is_moderator(user):
-    return user.groups.filter(name='Moderators').exists()
+    return moderators_check(user)
+
+
+@register.filter
+def rendition(image, label='thumb'):
+    """
+    URL of a pre-generated rendition of the image, usage: {{ image|rendition }} or {{ image|rendition:'detail' }}
+    """
+    return rendition_url(image, label)
+
+
+@register.filter
+def shareable_url(image):
+    """
+    URL of the image file to share: the plain URL of a public image, an expiring signed URL for a private one.
+    """
+    if not image.image:
+        return ''
+    if image.is_private:
+        return sign_media_url(image.image.name)
+    return image.image.url
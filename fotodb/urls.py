@@ -1,7 +1,6 @@
 # Built-in
 from django.urls import path
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib.auth.views import LogoutView as UserLogoutView
 # custom
 from .views.auth_views import *
@@ -11,9 +10,14 @@ from .views.albums_views import *
 from .views.images_views import *
 from .views.img_upload_views import *
 from .views.multi_img_upload_views import *
+from .views.chunked_upload_views import *
 from .views.profile_views import *
 from .views.reports_views import *
 from .views.main_page_views import *
+from .views.media_views import *
+from .views.api_views import *
+from .views.performance_views import *
+from .views.metrics_views import *
 
 urlpatterns = [
     # path('', TempMainView.as_view(), name='main_page'),
@@ -38,6 +42,16 @@ urlpatterns = [
     path('comment/<int:pk>/delete', DeleteCommentView.as_view(), name='delete_comment'),
     path('multiple/', MultipleImageView.as_view(), name='multiple_image_upload'),
     path('successfully_uploaded/', SuccessfullyUploadedView.as_view(), name='successfully_uploaded'),
+    # resumable chunked upload API:
+    path('uploads/', ChunkedUploadView.as_view(), name='chunked_upload'),
+    path('uploads/<uuid:upload_id>/', ChunkedUploadStatusView.as_view(), name='chunked_upload_status'),
+    path('uploads/<uuid:upload_id>/chunks/<int:index>/', ChunkedUploadChunkView.as_view(),
+         name='chunked_upload_chunk'),
+    path('uploads/<uuid:upload_id>/finalize/', ChunkedUploadFinalizeView.as_view(), name='chunked_upload_finalize'),
+    # read-only JSON feeds (infinite scroll):
+    path('api/images/', RecentImagesApiView.as_view(), name='api_recent_images'),
+    path('api/users/<int:pk>/images/', UserImagesApiView.as_view(), name='api_user_images'),
+    path('api/albums/<int:album_id>/images/', AlbumImagesApiView.as_view(), name='api_album_images'),
     path('contact/', ContactView.as_view(), name='contact_us'),
     path('contact/success/', ContactSuccessView.as_view(), name='contact_success'),
     # superusers/moderators urls:
@@ -50,5 +64,9 @@ urlpatterns = [
     path('reported/', ReportedImagesView.as_view(), name='reported_images'),
     path('reported/<int:pk>/delete/', ReportedImagesView.as_view(), name='delete_report'),
     path('reported/<int:pk>/cancel/', ReportedImagesView.as_view(), name='cancel_report'),
-
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path('reported/<int:pk>/similar/', SimilarImagesView.as_view(), name='similar_images'),
+    path('performance/', PerformanceStatsView.as_view(), name='performance_stats'),
+    path('metrics', MetricsView.as_view(), name='metrics'),
+    # uploaded files, with the permission check of private images:
+    path(settings.MEDIA_URL.lstrip('/') + '<path:name>', ProtectedMediaView.as_view(), name='protected_media'),
+]
@@ -1,19 +1,14 @@
+from django.conf import settings
 from django.shortcuts import get_object_or_404
 from django.views.generic import TemplateView, CreateView, ListView, DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.urls import reverse_lazy
 
 # Custom:
+from fotodb.caching import ConditionalGetMixin, namespace_version
 from fotodb.models import Album
 from fotodb.forms import AlbumForm
-
-
-def moderators_check(user):
-    """
-    function to check if the logged-in user belong to moderators group. used in:
-    ImageDetailView, ImageDeleteView, AlbumDeleteView, ImageEditView
-    """
-    return user.groups.filter(name='Moderators').exists()
+from fotodb.roles import moderators_check
 
 
 class AlbumListView(LoginRequiredMixin, ListView):
@@ -45,20 +40,27 @@ class AlbumCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class AlbumImageView(LoginRequiredMixin, TemplateView):
+class AlbumImageView(LoginRequiredMixin, ConditionalGetMixin, TemplateView):
     """
     View for displaying all images of a specific album.
-    Accessible only by logged-in users.
+    Accessible only by logged-in users. Repeat visits are answered 304 Not Modified until the album
+    or its images change (see fotodb/caching.py).
     """
     template_name = 'album_images.html'
 
+    def get_cache_namespaces(self):
+        return [f'album:{self.kwargs["album_id"]}']
+
     def get_context_data(self, **kwargs):
         # Retrieve album information based on the provided album_id and user authentication
         album_id = self.kwargs['album_id']
         album = get_object_or_404(Album, id=album_id, user=self.request.user)
         context = {
             'album': album,
+            # evaluated by the template only when the cached images grid is out of date (see fotodb/caching.py)
             'images': album.image_set.all(),
+            'images_version': namespace_version(f'album:{album.pk}'),
+            'page_cache_timeout': settings.PAGE_CACHE_TIMEOUT,
             'can_delete': True if self.request.user == album.user else False
         }
 
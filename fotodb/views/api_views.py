@@ -0,0 +1,145 @@
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import View
+
+# Custom:
+from fotodb.caching import ConditionalGetMixin
+from fotodb.models import Album, Image
+from fotodb.pagination import CursorPaginator
+from fotodb.renditions import rendition_url
+from fotodb.roles import moderators_check, visible_images
+
+API_PAGE_SIZE = 24
+API_MAX_PAGE_SIZE = 100
+
+# the fields a client can ask for with '?fields=', and the columns each of them needs
+API_FIELDS = {
+    'id': (),
+    'title': ('title',),
+    'category': ('category',),
+    'uploaded_at': (),
+    'user': ('user',),
+    'album': ('album',),
+    'is_private': ('is_private',),
+    'width': ('width',),
+    'height': ('height',),
+    'like_count': ('like_count',),
+    'comment_count': ('comment_count',),
+    'favorite_count': ('favorite_count',),
+    'url': (),
+    'thumb': ('image', 'renditions'),
+    'detail': ('image', 'renditions'),
+}
+DEFAULT_API_FIELDS = ('id', 'title', 'url', 'thumb', 'width', 'height', 'like_count', 'comment_count')
+
+
+def image_field(image, field):
+    if field == 'uploaded_at':
+        return image.uploaded_at.isoformat()
+    if field in ('user', 'album'):
+        return getattr(image, f'{field}_id')
+    if field == 'url':
+        return reverse('image_details', kwargs={'pk': image.pk})
+    if field in ('thumb', 'detail'):
+        return rendition_url(image, field) or None
+    return getattr(image, field)
+
+
+class ImageListApiMixin:
+    """
+    Read-only JSON list of images for infinite scrolling, newest first:
+    {"results": [{...}, ...], "next": url or null, "previous": url or null}.
+
+    GET parameters:
+        cursor: the opaque cursor of the next/previous url (keyset pagination, see fotodb/pagination.py)
+        limit: number of images per page (24 by default, at most 100)
+        fields: comma separated fields of each image (see API_FIELDS), only their columns are loaded
+
+    Private images are only listed for the users allowed to see them (the rule of ImageDetailView).
+    """
+
+    def get_images(self):
+        raise NotImplementedError
+
+    # the likes and comments don't invalidate the feed, the ETag changes with time for their counters
+    etag_period = settings.PAGE_CACHE_TIMEOUT
+
+    def get_cache_namespaces(self):
+        return ['feed']
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except Http404:
+            return JsonResponse({'error': 'not found'}, status=404)
+
+    def get(self, request, *args, **kwargs):
+        fields = request.GET.get('fields')
+        fields = [field for field in fields.split(',') if field] if fields else list(DEFAULT_API_FIELDS)
+        unknown = [field for field in fields if field not in API_FIELDS]
+        if unknown:
+            return JsonResponse({'error': f'Unknown fields: {", ".join(unknown)}'}, status=400)
+        try:
+            limit = min(max(int(request.GET.get('limit', API_PAGE_SIZE)), 1), API_MAX_PAGE_SIZE)
+        except ValueError:
+            return JsonResponse({'error': 'limit must be a number'}, status=400)
+
+        columns = {'uploaded_at'}.union(*(API_FIELDS[field] for field in fields))
+        images = visible_images(request.user, self.get_images()).only(*columns)
+        page = CursorPaginator(images, limit).get_page(request.GET.get('cursor'))
+
+        return JsonResponse({
+            'results': [{field: image_field(image, field) for field in fields} for image in page],
+            'next': self.page_url(page.next_cursor),
+            'previous': self.page_url(page.previous_cursor),
+        })
+
+    def page_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return f'{self.request.path}?{urlencode(sorted(params.items()))}'
+
+
+class RecentImagesApiView(ConditionalGetMixin, ImageListApiMixin, View):
+    """
+    The recent feed, optionally of one category: /api/images/?category=animal
+    """
+
+    def get_images(self):
+        images = Image.objects.all()
+        category = self.request.GET.get('category')
+        if category:
+            images = images.filter(category=category)
+        return images
+
+
+class UserImagesApiView(ConditionalGetMixin, ImageListApiMixin, View):
+    """
+    The images uploaded by a user (their private images only for themselves, superusers and moderators).
+    """
+
+    def get_images(self):
+        return Image.objects.filter(user_id=self.kwargs['pk'])
+
+
+class AlbumImagesApiView(ConditionalGetMixin, ImageListApiMixin, View):
+    """
+    The images of an album, for its owner, superusers and moderators (like AlbumImageView and the moderators views).
+    """
+
+    def get_cache_namespaces(self):
+        return ['feed', f'album:{self.kwargs["album_id"]}']
+
+    def get_images(self):
+        user = self.request.user
+        if not user.is_authenticated:
+            raise Http404
+        albums = Album.objects.all() if user.is_superuser or moderators_check(user) else Album.objects.filter(user=user)
+        album = get_object_or_404(albums, pk=self.kwargs['album_id'])
+        return album.image_set.all()
@@ -0,0 +1,117 @@
+import json
+
+from django.core.exceptions import PermissionDenied
+from django.http import HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import View
+
+# Custom:
+from fotodb.chunked_uploads import (ChunkedUploadError, start_upload, missing_chunks, write_chunk, finalize_upload,
+                                    discard_upload)
+from fotodb.forms import ChunkedUploadForm
+from fotodb.models import UploadSession
+
+
+def upload_status(upload):
+    """
+    JSON description of an upload: the chunk layout and which chunks the server still needs.
+    """
+    missing = missing_chunks(upload) if upload.status != UploadSession.COMPLETE else []
+    return {
+        'id': str(upload.pk),
+        'filename': upload.filename,
+        'size': upload.size,
+        'chunk_size': upload.chunk_size,
+        'total_chunks': upload.total_chunks,
+        'missing_chunks': missing,
+        'status': upload.status,
+        'image_url': reverse('image_details', kwargs={'pk': upload.image_id}) if upload.image_id else None,
+    }
+
+
+class ChunkedUploadMixin:
+    """
+    Looks up the upload of the url. An upload started by a logged-in user can only be continued by that user,
+    a guest upload by whoever knows its id.
+    """
+
+    def get_upload(self):
+        upload = get_object_or_404(UploadSession, pk=self.kwargs['upload_id'])
+        if upload.user_id is not None and upload.user_id != self.request.user.pk:
+            raise PermissionDenied
+        return upload
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except PermissionDenied:
+            return JsonResponse({'error': 'not your upload'}, status=403)
+        except ChunkedUploadError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+
+class ChunkedUploadView(View):
+    """
+    Start a resumable upload of a large image.
+
+    POST (form fields or a JSON object): filename, size, checksum (SHA-256 of the file in hexadecimal),
+    and optionally title, is_private, album and category.
+    Returns the upload id and the chunk layout (201), the client then sends the chunks with ChunkedUploadChunkView.
+    """
+
+    def post(self, request, *args, **kwargs):
+        if request.content_type == 'application/json':
+            try:
+                data = json.loads(request.body or '{}')
+            except ValueError:
+                return JsonResponse({'error': 'invalid JSON'}, status=400)
+            if not isinstance(data, dict):
+                return JsonResponse({'error': 'expected a JSON object'}, status=400)
+        else:
+            data = request.POST
+        form = ChunkedUploadForm(user=request.user, data=data)
+        if not form.is_valid():
+            return JsonResponse({'errors': form.errors}, status=400)
+
+        upload = form.save(commit=False)
+        upload.user = request.user if request.user.is_authenticated else None
+        start_upload(upload)
+        return JsonResponse(upload_status(upload), status=201)
+
+
+class ChunkedUploadStatusView(ChunkedUploadMixin, View):
+    """
+    GET: the state of the upload, with the chunks still missing (a client resuming an upload only sends those).
+    DELETE: abort the upload.
+    """
+
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(upload_status(self.get_upload()))
+
+    def delete(self, request, *args, **kwargs):
+        discard_upload(self.get_upload())
+        return HttpResponse(status=204)
+
+
+class ChunkedUploadChunkView(ChunkedUploadMixin, View):
+    """
+    PUT: the raw bytes of chunk number index as the request body, optionally with its SHA-256 in the
+    X-Chunk-Checksum header. The body is streamed to the staging file, chunks can be sent in any order or in parallel.
+    """
+
+    def put(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        write_chunk(upload, kwargs['index'], request, request.headers.get('X-Chunk-Checksum'))
+        return JsonResponse(upload_status(upload))
+
+
+class ChunkedUploadFinalizeView(ChunkedUploadMixin, View):
+    """
+    POST: verify the checksum of the assembled file and create the image. Can be repeated safely.
+    """
+
+    def post(self, request, *args, **kwargs):
+        upload = self.get_upload()
+        finalize_upload(upload)
+        return JsonResponse(upload_status(upload), status=201)
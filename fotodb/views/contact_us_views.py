@@ -1,8 +1,4 @@
 
-from django.conf import settings
-
-from django.core.mail import send_mail
-
 from django.http import HttpResponseRedirect
 from django.shortcuts import render
 
@@ -12,6 +8,7 @@ from django.urls import reverse
 
 # Custom:
 from fotodb.forms import ContactForm
+from fotodb.jobs import enqueue
 
 
 class ContactView(View):
@@ -28,13 +25,8 @@ class ContactView(View):
             email = form.cleaned_data['email']
             message = form.cleaned_data['message']
 
-            subject = f'Contact Us Form from {name}'
-            message = f'Name: {name}\nEmail: {email}\nMessage: {message}'
-            send_mail(subject, message, settings.DEFAULT_FROM_EMAIL, [settings.DEFAULT_FROM_EMAIL])
-
-            user_subject = 'Thank you for contacting us!'
-            user_message = 'Thank you for contacting us. We have received your message and will get back to you soon.'
-            send_mail(user_subject, user_message, settings.DEFAULT_FROM_EMAIL, [email])
+            # the emails are sent by the background worker (fotodb/tasks.py), the SMTP calls don't delay the answer
+            enqueue('send_contact_emails', name=name, email=email, message=message)
 
             return HttpResponseRedirect(reverse('contact_success'))
 
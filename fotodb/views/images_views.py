@@ -1,8 +1,5 @@
-import os
-
-from PIL import Image as PILImage
 from django.conf import settings
-from django.core.paginator import Paginator
+from django.db import transaction
 
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404
@@ -14,18 +11,15 @@ from django.urls import reverse, reverse_lazy
 from django.shortcuts import redirect
 
 # Custom:
+from fotodb.caching import CachedResponseMixin, ConditionalGetMixin
 from fotodb.models import Image, Album, Comment, Like, Favorite
 from fotodb.forms import ImageEditForm, CommentForm
+from fotodb.jobs import enqueue
+from fotodb.pagination import CursorPaginator
+from fotodb.roles import can_view_image, moderators_check
 
 
-def moderators_check(user):
-    """
-    function to check if the logged-in user belong to moderators group. used in:
-    ImageDetailView, ImageDeleteView, AlbumDeleteView, ImageEditView
-    """
-    return user.groups.filter(name='Moderators').exists()
-
-class ImageDetailView(DetailView):
+class ImageDetailView(ConditionalGetMixin, CachedResponseMixin, DetailView):
     """
     View for displaying detailed information about an uploaded image.
 
@@ -37,11 +31,24 @@ class ImageDetailView(DetailView):
     Methods:
         get_context_data(self, **kwargs): Retrieve and prepare data to be used in the template.
         post(self, request, *args, **kwargs): Handle POST requests, such as user actions like liking and commenting.
+
+    The page of anonymous users is cached until the image, its comments or likes change, and repeat visits
+    are answered 304 Not Modified until then (see fotodb/caching.py).
     """
     template_name = 'image_detail.html'
     model = Image
     context_object_name = 'image'
 
+    # the shareable link of a private image is signed for the current hour (see fotodb/signed_urls.py)
+    etag_period = 3600
+
+    def get_cache_namespaces(self):
+        return [f'image:{self.kwargs["pk"]}']
+
+    def get_queryset(self):
+        # the uploader is shown on the page, load it with the image
+        return Image.objects.select_related('user')
+
     def get_context_data(self, **kwargs):
         """
         Retrieve and prepare data to be used in the template.
@@ -53,21 +60,10 @@ class ImageDetailView(DetailView):
         """
         context = super().get_context_data(**kwargs)
         is_moderator = moderators_check(self.request.user)  # Check if the user is a moderator
-        image = self.get_object()
+        image = self.object
 
         # Determine if the image can be viewed based on privacy settings and user authentication
-        if image.is_private:
-            if not self.request.user.is_authenticated:
-                context['can_view'] = False
-
-            elif not (self.request.user == image.user or self.request.user.is_superuser or moderators_check(
-                    self.request.user)):
-                context['can_view'] = False
-
-            else:
-                context['can_view'] = True
-        else:
-            context['can_view'] = True
+        context['can_view'] = can_view_image(self.request.user, image)
 
         # Determine if the user has permission to delete the image
         if self.request.user == image.user:
@@ -76,13 +72,14 @@ class ImageDetailView(DetailView):
             context['can_delete'] = False
         context['is_moderator'] = is_moderator
         context['is_superuser'] = self.request.user.is_superuser
-        context['dimensions'] = f'{image.image.width} X {image.image.height} '
-        context['size'] = f'{image.image.size / 1000:.1f} kB'
+        # dimensions and size are stored on upload (see Image.update_file_metadata), the file isn't opened here
+        context['dimensions'] = f'{image.width} X {image.height} '
+        context['size'] = f'{(image.file_size or 0) / 1000:.1f} kB'
         # Retrieve comments associated with the image and provide them to the template in descensing order.
-        context['comments'] = Comment.objects.filter(image=image).order_by('-created_at')
+        context['comments'] = Comment.objects.filter(image=image).select_related('user').order_by('-created_at')
         liked = False
         favorite = False
-        like_count = self.object.like_set.count()
+        like_count = self.object.like_count
         if self.request.user.is_authenticated:
             context['comment_form'] = CommentForm()
             liked = self.object.like_set.filter(user=self.request.user).exists()
@@ -112,19 +109,27 @@ class ImageDetailView(DetailView):
             if action == 'like':
                 if not liked:
                     # If the user hasn't liked the image, create a new like
-                    Like.objects.create(user=self.request.user, image=image)
+                    with transaction.atomic():
+                        Like.objects.create(user=self.request.user, image=image)
+                        image.increment_counter('like_count')
             elif action == 'unlike':
                 if liked:
                     # If the user has liked the image, remove the like
-                    Like.objects.filter(user=self.request.user, image=image).delete()
+                    with transaction.atomic():
+                        deleted, _ = Like.objects.filter(user=self.request.user, image=image).delete()
+                        image.increment_counter('like_count', -deleted)
             elif action == 'favorite':
                 if not favorite:
                     # If the user hasn't favorited the image, create a new favorite
-                    Favorite.objects.create(user=self.request.user, image=image)
+                    with transaction.atomic():
+                        Favorite.objects.create(user=self.request.user, image=image)
+                        image.increment_counter('favorite_count')
             elif action == 'unfavorite':
                 if favorite:
                     # If the user has favorited the image, remove the favorite
-                    Favorite.objects.filter(user=self.request.user, image=image).delete()
+                    with transaction.atomic():
+                        deleted, _ = Favorite.objects.filter(user=self.request.user, image=image).delete()
+                        image.increment_counter('favorite_count', -deleted)
             else:
                 # Redirect back to the image details page if the action is not recognized
                 return HttpResponseRedirect(reverse('image_details', kwargs={'pk': image.pk}))
@@ -134,18 +139,27 @@ class ImageDetailView(DetailView):
             comment = form.save(commit=False)
             comment.user = request.user
             comment.image = image
-            comment.save()
+            with transaction.atomic():
+                comment.save()
+                image.increment_counter('comment_count')
             return HttpResponseRedirect(reverse('image_details', kwargs={'pk': image.pk}))
 
         return self.get(request, *args, **kwargs)
 
 
-class RecentUploadedView(TemplateView):
+class RecentUploadedView(ConditionalGetMixin, CachedResponseMixin, TemplateView):
     """
     A view that displays recently uploaded images with options to filter by categories.
     Images are sorted by upload date/time in descending order and displayed with pagination.
+    The pages of anonymous users are cached until an image changes, and repeat visits are answered 304 Not Modified
+    until then (see fotodb/caching.py). The likes and comments don't expire the feed, its counts can be
+    PAGE_CACHE_TIMEOUT seconds old.
     """
     template_name = 'recent.html'
+    etag_period = settings.PAGE_CACHE_TIMEOUT
+
+    def get_cache_namespaces(self):
+        return ['feed']
 
     def get_context_data(self, **kwargs):
         """
@@ -154,6 +168,8 @@ class RecentUploadedView(TemplateView):
         Selected Category: Checks if a specific category is selected through GET parameters.
         If selected, filters images based on the category; otherwise, shows all images.
         Pagination: Divides the images into pages, with each page displaying up to 12 images.
+        The pages are addressed by an opaque cursor (keyset pagination on uploaded_at/id),
+        so deep pages are as cheap as the first one.
         """
         context = super().get_context_data(**kwargs)
 
@@ -164,16 +180,17 @@ class RecentUploadedView(TemplateView):
         # Check if a specific category is selected through GET parameters
         selected_category = self.request.GET.get('category')
         if selected_category:
-            # Filter images based on the selected category and order by upload date/time
-            images = Image.objects.filter(category=selected_category).order_by('-uploaded_at')
+            # Filter images based on the selected category
+            images = Image.objects.filter(category=selected_category)
         else:
-            # Show all images, ordered by upload date/time
-            images = Image.objects.order_by('-uploaded_at')
+            # Show all images
+            images = Image.objects.all()
+        # the template compares the uploader with the logged-in user for every image
+        images = images.select_related('user')
 
-        # pagination
-        paginator = Paginator(images, 12)
-        page_number = self.request.GET.get('page')
-        page_object = paginator.get_page(page_number)
+        # pagination, ordered by upload date/time (newest first)
+        paginator = CursorPaginator(images, 12)
+        page_object = paginator.get_page(self.request.GET.get('cursor'))
 
         context['recent_images'] = page_object
         context['selected_category'] = selected_category
@@ -212,8 +229,8 @@ class ImageEditView(LoginRequiredMixin, UpdateView):
         form.fields['album'].queryset = Album.objects.filter(user=self.request.user)
         form.fields['category'].choices = Image.CATEGORY_CHOICES
 
-        original_width = self.object.image.width
-        original_height = self.object.image.height
+        original_width = self.object.width
+        original_height = self.object.height
 
         form.fields['width'].initial = original_width
         form.fields['height'].initial = original_height
@@ -223,32 +240,24 @@ class ImageEditView(LoginRequiredMixin, UpdateView):
     def form_valid(self, form):
         """
         Handles the form submission and updates the image details, including optional resizing.
-        If both width and height fields are provided, the image is resized accordingly.
+        If both width and height fields are provided, the image resizing is queued as a background job
+        (fotodb/tasks.py resize_image), so the request returns at once.
         """
-        image = form.save(commit=False)
-        # Get the values of width and height from the form's POST data
-        width = self.request.POST.get('width')
-        height = self.request.POST.get('height')
-
-        # Check if both width and height are provided
-        if width and height:
-            # Get the path to the original image on the server
-            original_image_path = image.image.path
-
-            # Open the original image using Pillow
-            with PILImage.open(original_image_path) as img:
-                # Resize the image using the specified width and height values
-                resized_img = img.resize((int(width), int(height)))
+        # Get the values of width and height from the form
+        width = form.cleaned_data.get('width')
+        height = form.cleaned_data.get('height')
 
-            # Define the path for the resized image
-            resized_image_path = os.path.join(os.path.dirname(original_image_path),
-                                              os.path.basename(original_image_path))
+        # only the edited columns are written: the counters, renditions and hashes of the row loaded at the start of
+        # the request may have changed since (likes, background jobs)
+        self.object = form.save(commit=False)
+        self.object.save(update_fields=form._meta.fields)
+        response = HttpResponseRedirect(self.get_success_url())
 
-            # Save the resized image to the specified path with the same format as the original
-            resized_img.save(resized_image_path, img.format)
-            image.image.name = os.path.relpath(resized_image_path, start=settings.MEDIA_ROOT)
+        # Check if both width and height are provided and differ from the current size
+        if width and height and (width, height) != (self.object.width, self.object.height):
+            enqueue('resize_image', image_id=self.object.pk, width=width, height=height)
 
-        return super().form_valid(form)
+        return response
 
 
 class ImageDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
@@ -316,5 +325,7 @@ class DeleteCommentView(View):
 
         if self.request.user == comment.image.user or self.request.user == comment.user or self.request.user.is_superuser or moderators_check(
                 self.request.user):
-            comment.delete()
+            with transaction.atomic():
+                comment.delete()
+                comment.image.increment_counter('comment_count', -1)
         return redirect('image_details', pk=comment.image.pk)
\ No newline at end of file
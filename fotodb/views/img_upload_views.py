@@ -1,16 +1,19 @@
 import os
-from urllib.parse import urlparse
 
+from asgiref.sync import sync_to_async
 from django.utils.text import slugify
 
 from django.views.generic import CreateView
 from django.urls import reverse_lazy
-from urllib.request import urlopen, HTTPError
 from django.core.files import File
+from django.db import transaction
 
 # Custom:
+from fotodb.blobs import store_image_file
+from fotodb.metrics import count_upload
 from fotodb.models import Image, Album
 from fotodb.forms import ImageForm
+from fotodb.remote_images import fetch_remote_image, RemoteImageError
 
 
 class HomeView(CreateView):
@@ -22,12 +25,51 @@ class HomeView(CreateView):
         form_class (class): The form class to be used for processing image uploads.
 
     Methods:
+        get(self, request, *args, **kwargs): Render the upload form.
+        post(self, request, *args, **kwargs): Validate the form and download the image first if a URL was given.
         get_form(self, form_class=None): Customize the form based on user authentication status.
         form_valid(self, form): Process the form and save the image, handling both URL and file uploads.
         get_success_url(self): Define the URL to redirect to after a successful form submission.
+
+    The view is asynchronous (served through murtidjango/asgi.py): the download of an image from a URL
+    is awaited on the event loop instead of holding a worker thread, the database work runs in sync_to_async.
     """
     template_name = 'index.html'
     form_class = ImageForm
+    # the downloaded image (fotodb.remote_images.RemoteImage) when uploading from a URL
+    remote_image = None
+
+    async def get(self, request, *args, **kwargs):
+        return await sync_to_async(super().get)(request, *args, **kwargs)
+
+    async def post(self, request, *args, **kwargs):
+        """
+        Validate the form, then save the uploaded file, or download the image from the URL
+        (with timeouts, size limit and file type check) and save it.
+        """
+        self.object = None
+        form = await sync_to_async(self.get_form)()
+        if not await sync_to_async(form.is_valid)():
+            return await sync_to_async(self.form_invalid)(form)
+
+        url = form.cleaned_data.get('url')
+        if not url:
+            return await sync_to_async(self.form_valid)(form)
+
+        try:
+            self.remote_image = await fetch_remote_image(url)
+        except RemoteImageError as e:
+            # Display error message if URL fetch fails
+            form.add_error(None, f"Failed to fetch image from URL: {e}")
+            return await sync_to_async(self.form_invalid)(form)
+
+        try:
+            return await sync_to_async(self.form_valid)(form)
+        finally:
+            self.remote_image.close()
+
+    async def put(self, request, *args, **kwargs):
+        return await self.post(request, *args, **kwargs)
 
     def get_form(self, form_class=None):
         """
@@ -55,39 +97,31 @@ class HomeView(CreateView):
         """
         Process the form and save the image, handling both URL and file uploads.
 
-        If URL is provided, fetch the image from the URL and save it.
+        If URL is provided, save the image downloaded by post().
         If file is uploaded, save it and associate it with the logged-in user.
         Generate a title if not provided.
         """
 
         image = form.save(commit=False)
 
-        if form.cleaned_data.get('url'):
-            url = form.cleaned_data.get('url')
-            try:
-                response = urlopen(url)
-                # Extract the file name from the URL
-                parsed_url = urlparse(url)
-                file_name = os.path.basename(parsed_url.path)
-
-                # Associate the uploaded image with the logged-in user
-                if self.request.user.is_authenticated:
-                    image.user = self.request.user
-
-                # Save the image from URL
-                image.image.save(
-                    file_name,
-                    File(response),
-                    save=True
-                )
-
-                # Generate title from the file name if not provided
-                if not image.title:
-                    image.title = os.path.splitext(file_name)[0]
-            except HTTPError as e:
-                # Display error message if URL fetch fails
-                form.add_error(None, f"Failed to fetch image from URL: {e}")
-                return self.form_invalid(form)
+        if self.remote_image is not None:
+            # The file name extracted from the URL
+            file_name = self.remote_image.name
+
+            # Associate the uploaded image with the logged-in user
+            if self.request.user.is_authenticated:
+                image.user = self.request.user
+
+            # Generate title from the file name if not provided
+            if not image.title:
+                image.title = os.path.splitext(file_name)[0]
+
+            # Save the image from URL (stored once per content, see fotodb/blobs.py)
+            with transaction.atomic():
+                store_image_file(image, File(self.remote_image.file))
+                image.update_file_metadata()
+                image.save()
+            count_upload('url', image.file_size)
         else:
             # Handle image upload from computer
             # Generate title from the file name if not provided
@@ -99,7 +133,11 @@ class HomeView(CreateView):
             # Associate the uploaded image with the logged-in user
             if self.request.user.is_authenticated:
                 image.user = self.request.user
-            image.save()
+            with transaction.atomic():
+                store_image_file(image, form.cleaned_data['image'])
+                image.update_file_metadata()
+                image.save()
+            count_upload('file', image.file_size)
 
         return super().form_valid(form)
 
@@ -0,0 +1,64 @@
+import mimetypes
+import posixpath
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views import View
+from django.views.static import serve
+
+# Custom:
+from fotodb.models import Image
+from fotodb.renditions import original_name
+from fotodb.roles import visible_images
+from fotodb.signed_urls import verify_media_signature
+
+
+class ProtectedMediaView(View):
+    """
+    Serves the uploaded images and their renditions (MEDIA_URL), after the same permission check as ImageDetailView:
+    the files of a private image are only sent to its uploader, superusers and moderators,
+    or to anyone with a signed link that hasn't expired (fotodb/signed_urls.py, checked without a database lookup).
+
+    Public files are cached for MEDIA_PUBLIC_MAX_AGE only, then revalidated (304 Not Modified after the permission
+    check): an image can become private (edited by its owner, reported), its file name doesn't change, and a long
+    lifetime would keep it visible in browsers and shared caches. Private files are only cached briefly
+    by the browser, signed links by anyone until they expire.
+
+    With MEDIA_X_ACCEL_REDIRECT set (behind nginx, see nginx.conf), the response is empty with an X-Accel-Redirect
+    header to an internal nginx location, and nginx sends the file itself. Without it (development), the file
+    is sent by Django.
+    """
+
+    def get(self, request, name, *args, **kwargs):
+        original = original_name(name)
+        if original is None or posixpath.normpath(name) != name:
+            raise Http404
+
+        if 'sig' in request.GET:
+            remaining = verify_media_signature(original, request.GET.get('expires'), request.GET['sig'])
+            if remaining is None:
+                raise PermissionDenied('The link is invalid or expired.')
+            cache_control = {'public': True, 'max_age': remaining}
+        else:
+            images = Image.objects.filter(image=original)
+            # the file can be shared by several images (see fotodb/blobs.py), it is public if one of them is.
+            # (checked first: the public files don't depend on the user, their responses don't vary with the cookie)
+            if images.filter(is_private=False).exists():
+                cache_control = {'public': True, 'max_age': settings.MEDIA_PUBLIC_MAX_AGE}
+            # Not found rather than forbidden, so the existence of a private file isn't revealed.
+            elif visible_images(request.user, images).exists():
+                cache_control = {'private': True, 'max_age': settings.MEDIA_PRIVATE_MAX_AGE}
+            else:
+                raise Http404
+
+        if settings.MEDIA_X_ACCEL_REDIRECT:
+            content_type, _ = mimetypes.guess_type(name)
+            response = HttpResponse(content_type=content_type or 'application/octet-stream')
+            response['X-Accel-Redirect'] = settings.MEDIA_X_ACCEL_REDIRECT + quote(name)
+        else:
+            response = serve(request, name, document_root=settings.MEDIA_ROOT)
+        patch_cache_control(response, **cache_control)
+        return response
@@ -0,0 +1,45 @@
+from ipaddress import ip_address, ip_network
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django.views import View
+
+# Custom:
+from fotodb import metrics
+from fotodb.models import Report
+
+
+def may_scrape(request):
+    """
+    The request comes from one of METRICS_ALLOWED_IPS, or has the "Authorization: Bearer <METRICS_TOKEN>" header.
+    """
+    if settings.METRICS_TOKEN:
+        scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and constant_time_compare(token.strip(), settings.METRICS_TOKEN):
+            return True
+    try:
+        address = ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return False
+    return any(address in ip_network(network, strict=False) for network in settings.METRICS_ALLOWED_IPS)
+
+
+class MetricsView(View):
+    """
+    The metrics in the Prometheus text format (see fotodb/metrics.py), with the number of reports waiting for
+    a moderator. Not protected by a login, for the Prometheus server: nginx doesn't forward /metrics, and the view
+    answers METRICS_ALLOWED_IPS and the METRICS_TOKEN bearer token only (403 otherwise).
+    404 when prometheus_client isn't installed or PROMETHEUS_METRICS is off.
+    """
+
+    def get(self, request, *args, **kwargs):
+        if not metrics.enabled():
+            raise Http404
+        if not may_scrape(request):
+            raise PermissionDenied
+        content, content_type = metrics.export({
+            'fotodb_reports_pending': ('Reported images waiting for a moderator', Report.objects.count()),
+        })
+        return HttpResponse(content, content_type=content_type)
@@ -13,14 +13,7 @@ from django.urls import reverse_lazy
 # Custom:
 from fotodb.models import Image, Album, Report
 from fotodb.forms import UserSearchForm
-
-
-def moderators_check(user):
-    """
-    function to check if the logged-in user belong to moderators group. used in:
-    ImageDetailView, ImageDeleteView, AlbumDeleteView, ImageEditView
-    """
-    return user.groups.filter(name='Moderators').exists()
+from fotodb.roles import moderators_check
 
 
 class UserListViewAdmin(LoginRequiredMixin, UserPassesTestMixin, ListView):
@@ -97,7 +90,7 @@ class UserImageViewAdmin(LoginRequiredMixin, ListView):
         """
         pk = self.kwargs['pk']
         user = get_object_or_404(User, pk=pk)
-        return Image.objects.filter(user=user).order_by('-uploaded_at')
+        return Image.objects.filter(user=user).select_related('user').order_by('-uploaded_at')
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -136,7 +129,7 @@ class UserAlbumImageViewAdmin(LoginRequiredMixin, TemplateView):
         album = get_object_or_404(Album, id=album_id, user=user)  # Get the album associated with the user and album ID.
 
         # Retrieve the images within the album and order them by upload date/time in descending order.
-        images = album.image_set.all().order_by('-uploaded_at')
+        images = album.image_set.select_related('user').order_by('-uploaded_at')
         context['user'] = user
         context['album'] = album
         context['images'] = images
@@ -1,5 +1,6 @@
 import os
 
+from django.core.exceptions import ValidationError
 from django.shortcuts import render
 
 from django.views.generic import TemplateView, FormView
@@ -7,6 +8,8 @@ from django.views.generic import TemplateView, FormView
 # Custom:
 from fotodb.models import Image
 from fotodb.forms import MultipleImageForm
+from fotodb.metrics import count_upload
+from fotodb.uploads import save_images
 
 
 class MultipleImageView(FormView):
@@ -21,7 +24,7 @@ class MultipleImageView(FormView):
     Methods:
         get(self, request, *args, **kwargs): Handle GET requests to render the form.
         get_form_kwargs(self): Customize form initialization by passing additional parameters.
-        form_valid(self, form): Process the form and save each uploaded image.
+        form_valid(self, form): Process the form and save the uploaded images.
     """
     template_name = 'multiple.html'
     form_class = MultipleImageForm
@@ -48,18 +51,16 @@ class MultipleImageView(FormView):
 
     def form_valid(self, form):
         """
-        Process the form and save each uploaded image.
+        Process the form and save the uploaded images.
 
-        For each uploaded image, create a new Image instance and save it.
+        Create a new Image instance for each uploaded image and save them together (see fotodb.uploads.save_images):
+        the files are checked and written in parallel and the rows are inserted at once.
         Store the primary keys of the uploaded images in the session for later use.
         """
-        images = form.cleaned_data['images']
-        uploaded_image_pks = []
-
-        for image in images:
-            album = form.cleaned_data.get('album')
-            is_private = form.cleaned_data.get('is_private', False)
-            new_image = Image(
+        album = form.cleaned_data.get('album')
+        is_private = form.cleaned_data.get('is_private', False)
+        new_images = [
+            Image(
                 image=image,
                 title=os.path.splitext(image.name)[0],
                 user=self.request.user if self.request.user.is_authenticated else None,
@@ -67,11 +68,18 @@ class MultipleImageView(FormView):
                 album=album,
                 category=form.cleaned_data['category']
             )
-
-            new_image.save()
-            uploaded_image_pks.append(new_image.pk)
-
-        self.request.session['uploaded_images'] = uploaded_image_pks
+            for image in form.cleaned_data['images']
+        ]
+
+        try:
+            save_images(new_images)
+        except ValidationError as e:
+            form.add_error('images', e)
+            return self.form_invalid(form)
+
+        for new_image in new_images:
+            count_upload('multiple', new_image.file_size)
+        self.request.session['uploaded_images'] = [new_image.pk for new_image in new_images]
         return super().form_valid(form)
 
 
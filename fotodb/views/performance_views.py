@@ -0,0 +1,25 @@
+from django.conf import settings
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
+from django.http import JsonResponse
+from django.views import View
+
+# Custom:
+from fotodb.performance import get_budget, summarize
+
+
+class PerformanceStatsView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    JSON aggregates of the last requests of each url name, measured by PerformanceMiddleware
+    (wall time percentiles, mean queries, database, Pillow time and response size, requests over budget),
+    with the budgets. The numbers are those of the process answering the request.
+    Accessible only by staff members and superusers.
+    """
+
+    def test_func(self):
+        return self.request.user.is_staff or self.request.user.is_superuser
+
+    def get(self, request, *args, **kwargs):
+        stats = summarize()
+        for url_name, aggregates in stats.items():
+            aggregates['budget'] = get_budget(url_name)
+        return JsonResponse({'window': settings.PERFORMANCE_WINDOW, 'urls': stats})
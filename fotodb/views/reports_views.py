@@ -1,6 +1,6 @@
 from django.shortcuts import get_object_or_404
 
-from django.views.generic import CreateView, ListView
+from django.views.generic import CreateView, DetailView, ListView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 
 from django.shortcuts import redirect
@@ -8,14 +8,8 @@ from django.shortcuts import redirect
 # Custom:
 from fotodb.models import Image, Report
 from fotodb.forms import ReportForm
-
-
-def moderators_check(user):
-    """
-    function to check if the logged-in user belong to moderators group. used in:
-    ImageDetailView, ImageDeleteView, AlbumDeleteView, ImageEditView
-    """
-    return user.groups.filter(name='Moderators').exists()
+from fotodb.roles import moderators_check
+from fotodb.similarity import find_similar_images
 
 
 class ReportImageView(LoginRequiredMixin, CreateView):
@@ -68,6 +62,12 @@ class ReportedImagesView(LoginRequiredMixin, UserPassesTestMixin, ListView):
         """
         return self.request.user.is_superuser or moderators_check(self.request.user)
 
+    def get_queryset(self):
+        """
+        The reports with the reporter, the reported image and its uploader loaded in the same query.
+        """
+        return Report.objects.select_related('reporter', 'image', 'image__user')
+
     def post(self, request, pk):
         report = get_object_or_404(Report, pk=pk)
 
@@ -82,3 +82,30 @@ class ReportedImagesView(LoginRequiredMixin, UserPassesTestMixin, ListView):
             report.delete()
 
         return redirect('reported_images')
+
+
+class SimilarImagesView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+    """
+    Shows the images that look like a reported image (resized or recompressed re-uploads),
+    found by their perceptual hash. Accessible by superusers and moderators.
+    """
+    template_name = 'similar_images.html'
+    model = Report
+    context_object_name = 'report'
+
+    def test_func(self):
+        """
+        Checks if the logged-in user is a superuser or a moderator.
+        """
+        return self.request.user.is_superuser or moderators_check(self.request.user)
+
+    def get_queryset(self):
+        return Report.objects.select_related('reporter', 'image', 'image__user')
+
+    def get_context_data(self, **kwargs):
+        """
+        Adds the similar images, with the number of differing hash bits (0 is the same picture), closest first.
+        """
+        context = super().get_context_data(**kwargs)
+        context['similar_images'] = find_similar_images(self.object.image)
+        return context
@@ -0,0 +1,98 @@
+import random
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# cookie of the users who wrote recently, their reads go to the primary
+PIN_COOKIE = 'read_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+# set by ReplicaMiddleware for the requests allowed to read from a replica, everything else (the other requests,
+# the management commands, the jobs worker) reads from the primary
+_read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in connections if alias != DEFAULT_DB_ALIAS]
+
+
+def read_from_primary():
+    """
+    The rest of the request reads from the primary, for the pages showing a change the replicas may not have yet
+    (see fotodb.caching.namespace_version).
+    """
+    _read_from_replica.set(False)
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of the GET requests (feeds, galleries, image pages) to a random replica of DATABASE_REPLICA_URLS,
+    and everything else to the primary ('default'): the writes, the reads of the other requests and the reads in
+    a transaction (they must see its writes). Without replicas, everything goes to the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if not replicas or not _read_from_replica.get() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # the replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReplicaMiddleware:
+    """
+    Lets the GET/HEAD requests read from the replicas (ReplicaRouter). A request that may write (POST, PUT, DELETE...)
+    sets a short-lived cookie, and the user reads from the primary until it expires (REPLICA_PIN_SECONDS),
+    so they see their upload, like or comment even if the replicas haven't received it yet.
+    Sync and async, as django.utils.deprecation.MiddlewareMixin.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+
+        token = _read_from_replica.set(self.may_read_from_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        return self.pin(request, response)
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+
+        token = _read_from_replica.set(self.may_read_from_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _read_from_replica.reset(token)
+        return self.pin(request, response)
+
+    def may_read_from_replica(self, request):
+        return request.method in ('GET', 'HEAD') and PIN_COOKIE not in request.COOKIES
+
+    def pin(self, request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=settings.REPLICA_PIN_SECONDS, httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,42 @@
+from django.db.backends.sqlite3 import base
+
+# set on every new connection, OPTIONS['pragmas'] overrides or adds values
+DEFAULT_PRAGMAS = {
+    # the readers don't block the writer and the writer doesn't block the readers
+    'journal_mode': 'WAL',
+    # with WAL, the database can't be corrupted, a power loss can only lose the last commits
+    'synchronous': 'NORMAL',
+    # milliseconds a connection waits for the write lock before failing with "database is locked"
+    'busy_timeout': 20000,
+    'mmap_size': 128 * 1024 * 1024,
+    # negative: in KiB, 20 MB of page cache per connection
+    'cache_size': -20000,
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    SQLite backend for concurrent writes (DATABASE_SQLITE_TUNING, see murtidjango/database.py).
+
+    Every connection is tuned with DEFAULT_PRAGMAS, and the transactions (transaction.atomic) start with
+    BEGIN IMMEDIATE: they take the write lock when they start, and wait for it (busy_timeout). With the default
+    BEGIN, a transaction that reads then writes (like/comment + counter update) only asks for the write lock at
+    its first write, and SQLite fails it at once with "database is locked" when another transaction is writing,
+    since waiting could deadlock.
+    """
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = {**DEFAULT_PRAGMAS, **self.settings_dict['OPTIONS'].get('pragmas', {})}
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
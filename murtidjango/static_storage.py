@@ -0,0 +1,53 @@
+import gzip
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # in requirements.txt; without it (a bare development install) only the .gz files are written
+    brotli = None
+
+# text formats worth compressing, the images and fonts are already compressed
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.mjs', '.map', '.json', '.svg', '.txt', '.html', '.xml', '.ico', '.ttf', '.eot')
+# smaller files don't gain anything once the headers are counted
+MIN_COMPRESS_SIZE = 256
+
+
+def compress(content):
+    """
+    The compressed versions of content, as {extension: bytes}. A version that doesn't save at least 5% is left out,
+    the server then sends the original file.
+    """
+    versions = {'.gz': gzip.compress(content, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        versions['.br'] = brotli.compress(content, quality=11)
+    return {extension: data for extension, data in versions.items() if len(data) < len(content) * 0.95}
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    collectstatic storage: the files are copied with the hash of their content in their name
+    (style.css -> style.3f2a9c1b0e4d.css, referenced by {% static %} when DEBUG is off, so they can be cached forever),
+    then a .gz and a .br (Brotli) copy of each text file are written next to it,
+    served by nginx without compressing on every request (gzip_static, see nginx.conf).
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+
+        names = set(paths).union(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE_EXTENSIONS or not self.exists(name):
+                continue
+            with self.open(name) as f:
+                content = f.read()
+            if len(content) < MIN_COMPRESS_SIZE:
+                continue
+            for extension, data in compress(content).items():
+                if self.exists(name + extension):
+                    self.delete(name + extension)
+                self._save(name + extension, ContentFile(data))
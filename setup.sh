@@ -24,8 +24,9 @@ echo "from django.contrib.auth import get_user_model; User = get_user_model(); U
 # Collect static files
 $PYTHON manage.py collectstatic --noinput
 
-# Create a new script to run the server
+# Create a new script to run the server and the background jobs worker
 echo "nohup sudo uvicorn murtidjango.asgi:application --host 0.0.0.0 --port 80 &" > run.sh
+echo "nohup $PYTHON manage.py run_jobs &" >> run.sh
 
 # Add execute permissions to the new script
 chmod +x run.sh